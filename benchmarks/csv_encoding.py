@@ -0,0 +1,60 @@
+"""
+Benchmark of the CSV encoding of a dataset, by number of worker processes,
+with the CPU time of the parent process, which bounds the speedup.
+
+    PYTHONPATH=. python benchmarks/csv_encoding.py [rows] [max workers]
+"""
+from datetime import datetime, timedelta
+import os
+import sys
+import time
+
+from gooddataclient.archiver import write_tmp_csv_file, get_row_encoder
+
+
+FIELDNAMES = [
+    'id', 'name', 'price', 'active', 'created', 'created_dt',
+    'updated', 'updated_dt', 'updated_tm', 'tm_updated_id',
+]
+SLI_MANIFEST = {
+    'dataSetSLIManifest': {
+        'parts': [{'columnName': name} for name in FIELDNAMES],
+        'csvParams': {'separatorChar': ',', 'quoteChar': '"'},
+    }
+}
+DATES = ['created']
+DATETIMES = ['updated']
+
+
+def get_rows(count):
+    origin = datetime(2013, 1, 1)
+    return [{
+        'id': i,
+        'name': u'product %d' % i,
+        'price': i * 1.5,
+        'active': i % 2 == 0,
+        'created': origin + timedelta(days=i % 1000),
+        'updated': origin + timedelta(seconds=i),
+    } for i in xrange(count)]
+
+
+def main(count=200000, max_workers=os.sysconf('SC_NPROCESSORS_ONLN')):
+    rows = get_rows(count)
+    row_encoder = get_row_encoder(SLI_MANIFEST, DATES, DATETIMES)
+    workers = 1
+    while workers <= max_workers:
+        start, cpu_start = time.time(), sum(os.times()[:2])
+        filename = write_tmp_csv_file(
+            rows, SLI_MANIFEST, DATES, DATETIMES, row_encoder, workers
+        )
+        duration, cpu = time.time() - start, sum(os.times()[:2]) - cpu_start
+        os.remove(filename)
+        # the encoding can't be faster than the work left to the parent process
+        print '%2d workers: %.2fs (%d rows/s), parent cpu %.2fs' % (
+            workers, duration, count / duration, cpu
+        )
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
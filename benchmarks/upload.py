@@ -0,0 +1,72 @@
+"""
+Benchmark of Dataset.upload against the offline stand-in of GoodData
+(tests/fake_server.py), by upload mode, with the time spent in each
+phase of the uploads.
+
+    PYTHONPATH=. python benchmarks/upload.py [rows] [latency (ms)] [task duration (ms)]
+"""
+import sys
+import time
+
+from gooddataclient import columns
+from gooddataclient.connection import Connection
+from gooddataclient.dataset import Dataset
+from gooddataclient.polling import Poller
+from gooddataclient.project import Project
+from gooddataclient.tracing import RecordingTracer
+
+from tests.fake_server import FakeGoodData
+
+
+class Product(Dataset):
+
+    id = columns.ConnectionPoint(title='Id', dataType='INT')
+    name = columns.Attribute(title='Name', dataType='VARCHAR(128)')
+    price = columns.Fact(title='Price', dataType='DECIMAL(8,2)')
+
+    def __init__(self, project, count):
+        super(Product, self).__init__(project)
+        self.count = count
+
+    def data(self):
+        return ({'id': i, 'name': u'product %d' % i, 'price': i * 1.5}
+                for i in xrange(self.count))
+
+
+MODES = (
+    ('archive', {}),
+    ('stream', {'stream': True}),
+    ('chunks', {'chunk_rows': 50000}),
+)
+
+
+def main(count=200000, latency=20, task_duration=500):
+    server = FakeGoodData(latency / 1000., task_duration / 1000.).start()
+    try:
+        tracer = RecordingTracer()
+        connection = Connection(
+            'user', 'password', host=server.url, webdav_host=server.url,
+            poller=Poller(interval=0.05), tracer=tracer
+        )
+        project = Project(connection).load(id=server.add_project('benchmark'))
+        dataset = Product(project, count)
+        dataset.create()
+        for name, kwargs in MODES:
+            tracer.clear()
+            start = time.time()
+            dataset.upload(**kwargs)
+            duration = time.time() - start
+            phases = {}
+            for span in tracer.spans:
+                if span.name != 'upload':
+                    phases[span.name] = phases.get(span.name, 0) + span.duration
+            print '%-8s %.2fs (%d rows/s) %s' % (
+                name, duration, count / duration,
+                ' '.join('%s=%.2fs' % phase for phase in sorted(phases.iteritems()))
+            )
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -1,20 +1,41 @@
-from collections import Iterable
+from collections import Iterable, deque
+from cStringIO import StringIO
 import csv
 from datetime import timedelta, datetime
 import hashlib
+from itertools import imap
+from multiprocessing import Pool
 import os
 import shutil
+import struct
+import time
 from tempfile import mkstemp
+import zipfile
 from zipfile import ZipFile
+import zlib
 
 import simplejson as json
 
-from gooddataclient.formatter import csv_encode_dict, csv_decode_dict, format_dates
+from gooddataclient.columnar import is_columnar, iter_columnar_rows
+from gooddataclient.formatter import csv_decode_dict, RowEncoder
+from gooddataclient.pipeline import ListSlice, iter_chunks
+from gooddataclient.tracing import NULL_TRACER
 
 
 DLI_MANIFEST_FILENAME = 'upload_info.json'
 CSV_DATA_FILENAME = 'data.csv'
 DEFAULT_ARCHIVE_NAME = 'upload.zip'
+# size of the blocks read from the archive while uploading it
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# size of the csv blocks encoded in memory when streaming an archive
+CSV_BLOCK_SIZE = 64 * 1024
+# number of rows sent at once to a worker process encoding csv
+WORKER_SHARD_ROWS = 10000
+# zip format limits, bigger archives would need zip64 extensions
+ZIP_MAX_SIZE = 0xFFFFFFFF
+ZIP_DATA_DESCRIPTOR = '<4sLLL'
+ZIP_DATA_DESCRIPTOR_SIGNATURE = 'PK\x07\x08'
+ZIP_FLAG_DATA_DESCRIPTOR = 0x08
 
 
 def write_tmp_file(content):
@@ -32,36 +53,255 @@ def write_tmp_file(content):
     return filename
 
 
-def write_tmp_csv_file(csv_data, sli_manifest, dates, datetimes):
+def write_tmp_csv_file(csv_data, sli_manifest, dates, datetimes, row_encoder=None,
+                       workers=None, encoder_pool=None):
     '''
     Write a CSV temporary file with values in csv_data - list of dicts.
 
-    @param csv_data: list of dicts
+    @param csv_data: list of dicts, or columnar data (see encode_rows)
     @param sli_manifest: json sli_manifest
     @param dates: list of date fields
     @param datetimes: list of datetime fields
+    @param row_encoder: the RowEncoder of the rows, compiled
+                        from the sli_manifest if None
+    @param workers: if more than 1, the number of processes
+                    encoding the rows (see iter_csv_shards)
+    @param encoder_pool: the EncoderPool encoding the rows, if any
     '''
-    fieldnames = [part['columnName'] for part in sli_manifest['dataSetSLIManifest']['parts']]
+    row_encoder = row_encoder or get_row_encoder(sli_manifest, dates, datetimes)
     fp, filename = mkstemp()
     # FIXME: shouldn't close and reopen the file
     os.close(fp)
 
     with open(filename, 'w+b') as file:
-        writer = csv.DictWriter(
-            file, fieldnames=fieldnames,
-            delimiter=sli_manifest['dataSetSLIManifest']['csvParams']['separatorChar'],
-            quotechar=sli_manifest['dataSetSLIManifest']['csvParams']['quoteChar'],
-            quoting=csv.QUOTE_ALL
+        writer = get_csv_writer(file, sli_manifest)
+        if encoder_pool is not None and not is_columnar(csv_data):
+            for block in encoder_pool.iter_shards(csv_data):
+                file.write(block)
+        elif use_workers(csv_data, workers):
+            for block in iter_csv_shards(csv_data, sli_manifest, row_encoder, workers):
+                file.write(block)
+        else:
+            writer.writerows(encode_rows(csv_data, row_encoder))
+
+    return filename
+
+
+def encode_rows(csv_data, row_encoder):
+    '''
+    Iterate over the encoded rows of csv_data: an iterable of rows,
+    or columnar data (a pandas DataFrame or a dict of NumPy arrays)
+    which is encoded column by column.
+
+    @param csv_data: the rows or columns to encode
+    @param row_encoder: the RowEncoder of the rows
+    '''
+    if is_columnar(csv_data):
+        return iter_columnar_rows(csv_data, row_encoder)
+    return imap(row_encoder, csv_data)
+
+
+def use_workers(csv_data, workers):
+    '''
+    Tell if csv_data is worth encoding in worker processes:
+    columnar data is already encoded efficiently.
+    '''
+    return workers is not None and workers > 1 and not is_columnar(csv_data)
+
+
+# the parameters of a worker process of an EncoderPool: the RowEncoder,
+# the csv delimiter and quote char, and the rows inherited from the
+# parent process, set once when the process starts (see EncoderPool)
+_worker_params = None
+
+
+def init_encoder_worker(row_encoder, delimiter, quotechar, rows):
+    global _worker_params
+    _worker_params = (row_encoder, delimiter, quotechar, rows)
+
+
+def encode_csv_shard(rows):
+    '''
+    Encode a shard of rows as CSV (without headers), in a worker process.
+    '''
+    row_encoder, delimiter, quotechar, _ = _worker_params
+    buf = StringIO()
+    writer = csv.writer(buf, delimiter=delimiter, quotechar=quotechar, quoting=csv.QUOTE_ALL)
+    writer.writerows(imap(row_encoder, rows))
+    return buf.getvalue()
+
+
+def encode_inherited_shard(start, stop):
+    '''
+    Encode the inherited rows start:stop as CSV, in a worker process.
+    '''
+    return encode_csv_shard(_worker_params[3][start:stop])
+
+
+class EncoderPool(object):
+    '''
+    A pool of processes encoding rows as CSV with a RowEncoder.
+
+    The rows of a list or a tuple given to the pool are inherited by the
+    processes when they are forked: only the bounds of their shards are
+    sent to the processes, so that the parent process does almost no
+    work and the encoding scales with the number of processes. The
+    other rows are pickled to the processes shard by shard, which costs
+    about as much as encoding them, so they must be picklable.
+
+    A pool can encode several archives, the chunks of its rows for
+    instance (see iter_slices). It should be created before the threads
+    using it are started, since forking from threads is unsafe.
+    '''
+
+    def __init__(self, sli_manifest, row_encoder, workers, rows=None):
+        '''
+        @param sli_manifest: json sli_manifest
+        @param row_encoder: the RowEncoder of the rows
+        @param workers: the number of processes
+        @param rows: the list or tuple of rows inherited by the processes
+        '''
+        self.workers = workers
+        self.rows = rows if isinstance(rows, (list, tuple)) else None
+        delimiter, quotechar = get_csv_params(sli_manifest)
+        self.pool = Pool(
+            workers, init_encoder_worker, (row_encoder, delimiter, quotechar, self.rows)
         )
-        headers = dict((n, n) for n in fieldnames)
-        writer.writerow(headers)
 
-        for line in csv_data:
-            line = format_dates(line, dates, datetimes)
-            line = csv_encode_dict(line)
-            writer.writerow(line)
+    def get_bounds(self, csv_data):
+        '''
+        Return the bounds (start, stop) of csv_data in the inherited
+        rows, or None if csv_data is not part of them.
+        '''
+        if self.rows is None:
+            return None
+        if csv_data is self.rows:
+            return 0, len(self.rows)
+        if isinstance(csv_data, ListSlice) and csv_data.items is self.rows:
+            return csv_data.start, csv_data.stop
+        return None
+
+    def iter_shards(self, csv_data, shard_rows=WORKER_SHARD_ROWS):
+        '''
+        Generator encoding csv_data as CSV: the rows are cut into shards
+        of shard_rows rows, encoded in parallel, and the CSV of the shards
+        (without headers) is yielded in order. At most 2 * workers shards
+        are pending, so the memory used stays bounded.
+
+        @param csv_data: iterable of rows
+        @param shard_rows: the number of rows per shard
+        '''
+        bounds = self.get_bounds(csv_data)
+        if bounds is not None:
+            tasks = (
+                (encode_inherited_shard, (shard_start, min(shard_start + shard_rows, bounds[1])))
+                for shard_start in xrange(bounds[0], bounds[1], shard_rows)
+            )
+        else:
+            tasks = (
+                (encode_csv_shard, (rows,)) for rows in iter_chunks(csv_data, shard_rows)
+            )
+        pending = deque()
+        for function, args in tasks:
+            pending.append(self.pool.apply_async(function, args))
+            if len(pending) > 2 * self.workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_csv_shards(csv_data, sli_manifest, row_encoder, workers,
+                    shard_rows=WORKER_SHARD_ROWS):
+    '''
+    Generator encoding csv_data as CSV in a pool of processes created
+    for csv_data only, by shards of shard_rows rows (see EncoderPool).
+
+    @param csv_data: list of dicts
+    @param sli_manifest: json sli_manifest
+    @param row_encoder: the RowEncoder of the rows
+    @param workers: the number of processes
+    @param shard_rows: the number of rows per shard
+    '''
+    with EncoderPool(sli_manifest, row_encoder, workers, csv_data) as pool:
+        for block in pool.iter_shards(csv_data, shard_rows):
+            yield block
+
+
+def get_fieldnames(sli_manifest):
+    return [part['columnName'] for part in sli_manifest['dataSetSLIManifest']['parts']]
+
+
+def get_row_encoder(sli_manifest, dates, datetimes):
+    '''
+    Compile the RowEncoder of the columns of the sli_manifest.
+    '''
+    return RowEncoder(get_fieldnames(sli_manifest), dates, datetimes)
+
+
+def get_csv_params(sli_manifest):
+    '''
+    Get the CSV delimiter and quote char of the sli_manifest.
+    '''
+    csv_params = sli_manifest['dataSetSLIManifest']['csvParams']
+    return csv_params['separatorChar'], csv_params['quoteChar']
+
+
+def get_csv_writer(file, sli_manifest):
+    '''
+    Create a CSV writer following the sli_manifest csv parameters,
+    and write the headers in the file.
+
+    @param file: the file to write into
+    @param sli_manifest: json sli_manifest
+    '''
+    delimiter, quotechar = get_csv_params(sli_manifest)
+    writer = csv.writer(file, delimiter=delimiter, quotechar=quotechar, quoting=csv.QUOTE_ALL)
+    writer.writerow(get_fieldnames(sli_manifest))
+    return writer
 
-    return filename
+
+def iter_csv_blocks(csv_data, sli_manifest, dates, datetimes,
+                    block_size=CSV_BLOCK_SIZE, row_encoder=None, workers=None):
+    '''
+    Generator encoding csv_data as CSV, in memory, by blocks
+    of about block_size bytes.
+
+    @param csv_data: list of dicts, or columnar data (see encode_rows)
+    @param sli_manifest: json sli_manifest
+    @param dates: list of date fields
+    @param datetimes: list of datetime fields
+    @param block_size: minimum size (in bytes) of the yielded blocks
+    @param row_encoder: the RowEncoder of the rows, compiled
+                        from the sli_manifest if None
+    @param workers: if more than 1, the number of processes
+                    encoding the rows, which are then yielded
+                    by shards (see iter_csv_shards)
+    '''
+    row_encoder = row_encoder or get_row_encoder(sli_manifest, dates, datetimes)
+    buf = StringIO()
+    writer = get_csv_writer(buf, sli_manifest)
+    if use_workers(csv_data, workers):
+        yield buf.getvalue()
+        for block in iter_csv_shards(csv_data, sli_manifest, row_encoder, workers):
+            yield block
+        return
+    for row in encode_rows(csv_data, row_encoder):
+        writer.writerow(row)
+        if buf.tell() >= block_size:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
 
 
 def write_tmp_zipfile(files):
@@ -85,7 +325,8 @@ def write_tmp_zipfile(files):
 
 def create_archive(
     data, sli_manifest, dates, datetimes, keep_csv=False,
-    csv_file=None, csv_input_path=None
+    csv_file=None, csv_input_path=None, row_encoder=None, workers=None,
+    tracer=None, encoder_pool=None
 ):
     """
     Zip the data and sli_manifest files to an archive.
@@ -95,15 +336,26 @@ def create_archive(
     @param sli_manifest: json sli_manifest
     @param csv_input_path: create archive with this
                            csv data instead of data
+    @param row_encoder: the RowEncoder of the data rows
+    @param workers: if more than 1, the number of processes
+                    encoding the data rows
+    @param tracer: the Tracer of the encoding and zipping phases
+    @param encoder_pool: the EncoderPool encoding the data rows, if any
 
     return the filename to the temporary zip file
     """
+    tracer = tracer or NULL_TRACER
     if csv_input_path:
         data_path = csv_input_path
     elif isinstance(data, str):
         data_path = write_tmp_file(data)
     elif isinstance(data, Iterable):
-        data_path = write_tmp_csv_file(data, sli_manifest, dates, datetimes)
+        with tracer.span('encode') as span:
+            data_path = write_tmp_csv_file(
+                data, sli_manifest, dates, datetimes, row_encoder, workers, encoder_pool
+            )
+            if span.recording:
+                span.set(bytes=os.path.getsize(data_path))
     else:
         raise TypeError('Data should be either a string or an iterable')
 
@@ -111,10 +363,13 @@ def create_archive(
         sli_manifest = json.dumps(sli_manifest)
 
     sli_manifest_path = write_tmp_file(sli_manifest)
-    archive = write_tmp_zipfile((
-        (data_path, CSV_DATA_FILENAME),
-        (sli_manifest_path, DLI_MANIFEST_FILENAME)
-    ))
+    with tracer.span('zip') as span:
+        archive = write_tmp_zipfile((
+            (data_path, CSV_DATA_FILENAME),
+            (sli_manifest_path, DLI_MANIFEST_FILENAME)
+        ))
+        if span.recording:
+            span.set(bytes=os.path.getsize(archive))
 
     if keep_csv:
         if not csv_file:
@@ -127,6 +382,165 @@ def create_archive(
     return archive
 
 
+def read_in_chunks(file, chunk_size=UPLOAD_CHUNK_SIZE):
+    '''
+    Generator reading a file in blocks of fixed size,
+    so that it is never fully loaded into memory.
+
+    @param file: an opened file
+    @param chunk_size: the size (in bytes) of the blocks
+    '''
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def check_zip_size(file_size, end_offset):
+    '''
+    Raise LargeZipFile as soon as a streamed entry exceeds the sizes
+    of the zip format (without zip64), before its blocks are sent.
+
+    @param file_size: the uncompressed size of the entry so far
+    @param end_offset: the offset of the end of its compressed data
+    '''
+    if max(file_size, end_offset) > ZIP_MAX_SIZE:
+        raise zipfile.LargeZipFile('Streamed archives cannot exceed 4GB')
+
+
+def iter_zip_stream(files):
+    '''
+    Generator zipping files on the fly: the zip archive is yielded
+    by blocks, as soon as they are compressed, so that it never
+    lives on disk nor entirely in memory.
+    As the sizes are unknown beforehand, each entry is followed
+    by a data descriptor.
+
+    @param files: list of tuples (name_of_the_file, iterable_of_blocks)
+    '''
+    date_time = time.localtime(time.time())[:6]
+    dos_date = (date_time[0] - 1980) << 9 | date_time[1] << 5 | date_time[2]
+    dos_time = date_time[3] << 11 | date_time[4] << 5 | (date_time[5] // 2)
+    offset = 0
+    central_directory = []
+
+    for name, blocks in files:
+        header_offset = offset
+        file_header = struct.pack(
+            zipfile.structFileHeader, zipfile.stringFileHeader,
+            20, 0, ZIP_FLAG_DATA_DESCRIPTOR, zipfile.ZIP_DEFLATED,
+            dos_time, dos_date, 0, 0, 0, len(name), 0
+        ) + name
+        offset += len(file_header)
+        yield file_header
+
+        crc, compress_size, file_size = 0, 0, 0
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        for block in blocks:
+            file_size += len(block)
+            crc = zlib.crc32(block, crc) & 0xffffffff
+            compressed = compressor.compress(block)
+            if compressed:
+                compress_size += len(compressed)
+                check_zip_size(file_size, offset + compress_size)
+                yield compressed
+        compressed = compressor.flush()
+        compress_size += len(compressed)
+        check_zip_size(file_size, offset + compress_size)
+        yield compressed
+
+        data_descriptor = struct.pack(
+            ZIP_DATA_DESCRIPTOR, ZIP_DATA_DESCRIPTOR_SIGNATURE,
+            crc, compress_size, file_size
+        )
+        offset += compress_size + len(data_descriptor)
+        yield data_descriptor
+
+        central_directory.append(struct.pack(
+            zipfile.structCentralDir, zipfile.stringCentralDir,
+            20, 0, 20, 0, ZIP_FLAG_DATA_DESCRIPTOR, zipfile.ZIP_DEFLATED,
+            dos_time, dos_date, crc, compress_size, file_size,
+            len(name), 0, 0, 0, 0, 0, header_offset
+        ) + name)
+
+    central_directory = ''.join(central_directory)
+    yield central_directory
+    yield struct.pack(
+        zipfile.structEndArchive, zipfile.stringEndArchive, 0, 0,
+        len(files), len(files), len(central_directory), offset, 0
+    )
+
+
+def create_archive_stream(
+    data, sli_manifest, dates, datetimes, csv_input_path=None, row_encoder=None,
+    workers=None
+):
+    """
+    Zip the data and sli_manifest files on the fly, without any
+    temporary file: the rows are encoded, compressed and yielded
+    as the returned generator is consumed.
+
+    @param data: csv data
+    @param sli_manifest: json sli_manifest
+    @param csv_input_path: create archive with this
+                           csv data instead of data
+    @param row_encoder: the RowEncoder of the data rows
+    @param workers: if more than 1, the number of processes
+                    encoding the data rows
+
+    return a generator of the zip archive blocks
+    """
+    if csv_input_path:
+        csv_blocks = iter_file_blocks(csv_input_path, CSV_BLOCK_SIZE)
+    elif isinstance(data, str):
+        csv_blocks = [data]
+    elif isinstance(data, Iterable):
+        csv_blocks = iter_csv_blocks(
+            data, sli_manifest, dates, datetimes,
+            row_encoder=row_encoder, workers=workers
+        )
+    else:
+        raise TypeError('Data should be either a string or an iterable')
+
+    if isinstance(sli_manifest, dict):
+        sli_manifest = json.dumps(sli_manifest)
+
+    return iter_zip_stream((
+        (CSV_DATA_FILENAME, csv_blocks),
+        (DLI_MANIFEST_FILENAME, [sli_manifest])
+    ))
+
+
+def join_in_chunks(blocks, chunk_size=UPLOAD_CHUNK_SIZE):
+    '''
+    Generator gathering small blocks into chunks of at
+    least chunk_size bytes (except the last one).
+
+    @param blocks: an iterable of strings
+    @param chunk_size: the minimum size (in bytes) of the chunks
+    '''
+    buf, size = [], 0
+    for block in blocks:
+        buf.append(block)
+        size += len(block)
+        if size >= chunk_size:
+            yield ''.join(buf)
+            buf, size = [], 0
+    if buf:
+        yield ''.join(buf)
+
+
+def iter_file_blocks(path, chunk_size=UPLOAD_CHUNK_SIZE):
+    '''
+    Generator reading the file at path by blocks, and
+    closing it once read.
+    '''
+    with open(path, 'rb') as file:
+        for chunk in read_in_chunks(file, chunk_size):
+            yield chunk
+
+
 def csv_to_list(data_csv):
     '''
     Create list of dicts from CSV string.
@@ -0,0 +1,85 @@
+from multiprocessing.pool import ThreadPool
+
+# default number of calls running at the same time
+ASYNC_WORKERS = 16
+
+
+class AsyncClient(object):
+    """
+    A client running the calls of the library in the background, so
+    that a single process can drive many exports and uploads at once.
+    Each method starts a call and returns right away an AsyncResult
+    (see multiprocessing.pool): `get(timeout)` waits for the call and
+    returns its result or raises its error, `ready()` tells if it is
+    done. The calls run the same code as the blocking API, with the
+    session and poller of their connection.
+
+    Calls on the same Report or Dashboard object should not overlap,
+    these objects keep the state of their last call.
+
+    :param workers:     the maximum number of calls running at once,
+                        the other ones wait for their turn.
+    """
+
+    def __init__(self, workers=ASYNC_WORKERS):
+        self.workers = workers
+        self.pool = ThreadPool(workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Wait for the pending calls, and stop the threads.
+        """
+        self.pool.close()
+        self.pool.join()
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Call `function(*args, **kwargs)` in the background.
+        """
+        return self.pool.apply_async(function, args, kwargs)
+
+    def gather(self, results, timeout=None):
+        """
+        Wait for several AsyncResults, and return their results in
+        order. The first error met is raised.
+
+        :param results:     the AsyncResults to wait for.
+        :param timeout:     if not None, the maximum waiting time
+                            (in seconds) for each result.
+        """
+        return [result.get(timeout) for result in results]
+
+    def execute_maql(self, project, maql, **kwargs):
+        return self.submit(project.execute_maql, maql, **kwargs)
+
+    def execute_dml(self, project, maql, **kwargs):
+        return self.submit(project.execute_dml, maql, **kwargs)
+
+    def integrate_uploaded_data(self, project, dir_name, **kwargs):
+        return self.submit(project.integrate_uploaded_data, dir_name, **kwargs)
+
+    def upload(self, dataset, **kwargs):
+        if kwargs.get('workers') > 1:
+            # forking processes from the threads of the pool is unsafe
+            raise TypeError('Asynchronous uploads cannot encode rows in worker processes')
+        return self.submit(dataset.upload, **kwargs)
+
+    def get_remote_diff(self, state):
+        return self.submit(state.get_remote_diff)
+
+    def get_report(self, report, **kwargs):
+        return self.submit(report.get_report, **kwargs)
+
+    def save_report(self, report, file_path, **kwargs):
+        return self.submit(report.save_report, file_path, **kwargs)
+
+    def save_as_pdf(self, dashboard, common_filters, wildcard_filter, output_path, **kwargs):
+        return self.submit(
+            dashboard.save_as_pdf, common_filters, wildcard_filter, output_path, **kwargs
+        )
@@ -0,0 +1,99 @@
+import logging
+import Queue
+import threading
+from multiprocessing.pool import ThreadPool
+
+logger = logging.getLogger("gooddataclient")
+
+
+def run_batch(items, start, get_check, finish, poller, workers=4, max_in_flight=None):
+    """
+    Run a batch of asynchronous GoodData tasks (exports for instance):
+    the tasks are started by a pool of `workers` threads, each task is
+    polled from a single loop (see Poller.iter_poll_all) as soon as it
+    is started, and each result is queued to the pool as soon as it is
+    ready. The pool runs at most `workers` requests at the same time,
+    while the loop keeps polling the other tasks, and a new task is
+    started only when fewer than `max_in_flight` are running.
+
+    :param items:           the list of the items to process.
+    :param start:           a callable start(item) starting the task of
+                            an item, its result is given to get_check.
+    :param get_check:       a callable get_check(item, started) returning
+                            the check function polling the task of an item.
+    :param finish:          a callable finish(item, result) processing the
+                            result of the task of an item.
+    :param poller:          the Poller used to wait for the tasks.
+    :param workers:         the maximum number of concurrent requests.
+    :param max_in_flight:   the maximum number of tasks started and not
+                            finished yet, 2 * workers by default.
+
+    Returns a tuple (values, errors): the list of the values returned
+    by finish, in order (None for the failed items), and a dictionary
+    index -> exception of the failed items.
+    """
+    values, errors = [None] * len(items), {}
+    if not items:
+        return values, errors
+    pool = ThreadPool(workers)
+    # the checks of the started tasks, then None once all are started
+    started = Queue.Queue()
+    lock = threading.Lock()
+    # the indexes of the items to start, emptied if the polling fails
+    to_start = range(len(items))
+    to_start.reverse()
+    remaining = [len(items)]
+
+    def safe_check(check):
+        # a failed task is done, it must not stop the polling of the others
+        def polled_check():
+            try:
+                return check()
+            except Exception, err:
+                return True, err
+        return polled_check
+
+    def start_next():
+        with lock:
+            if not to_start:
+                return
+            index = to_start.pop()
+        pool.apply_async(run_start, (index,))
+
+    def run_start(index):
+        try:
+            started.put((index, safe_check(get_check(items[index], start(items[index])))))
+        except Exception, err:
+            errors[index] = err
+            start_next()
+        with lock:
+            remaining[0] -= 1
+            if not remaining[0]:
+                started.put(None)
+
+    def run_finish(index, result):
+        try:
+            values[index] = finish(items[index], result)
+        except Exception, err:
+            errors[index] = err
+        finally:
+            start_next()
+
+    try:
+        for _ in range(max_in_flight or 2 * workers):
+            start_next()
+        for index, result in poller.iter_poll_all([], started):
+            if isinstance(result, Exception):
+                errors[index] = result
+                start_next()
+                continue
+            pool.apply_async(run_finish, (index, result))
+    finally:
+        with lock:
+            del to_start[:]
+        pool.close()
+        pool.join()
+
+    for index, err in sorted(errors.iteritems()):
+        logger.debug('Task %d of the batch failed: %s' % (index, err))
+    return values, errors
@@ -0,0 +1,144 @@
+from functools import partial
+import logging
+from multiprocessing.pool import ThreadPool
+from Queue import Queue
+
+from gooddataclient.columns import Date, Reference
+from gooddataclient.dataset import DateDimension
+from gooddataclient.exceptions import BulkUploadFailed
+
+logger = logging.getLogger("gooddataclient")
+
+
+def get_upload_graph(project, dataset_classes):
+    """
+    Build the dependency graph of the upload of several datasets.
+    A dataset depends on the datasets it references, and on its date
+    dimensions, which are created once, before their datasets.
+
+    :param project:             the project to upload to.
+    :param dataset_classes:     the Dataset subclasses to upload.
+
+    Returns a tuple (datasets, date_dimensions, dependencies):
+    a dictionary identifier -> Dataset, a dictionary date dimension
+    name -> include_time, and a dictionary node -> set of nodes where
+    nodes are tuples ('dataset', identifier) or ('date', name).
+    """
+    datasets = dict(
+        (dataset.identifier, dataset)
+        for dataset in (DatasetClass(project) for DatasetClass in dataset_classes)
+    )
+    date_dimensions, dependencies = {}, {}
+
+    for identifier, dataset in datasets.iteritems():
+        node = ('dataset', identifier)
+        dependencies[node] = set()
+        for _, column in dataset._columns:
+            if isinstance(column, Reference):
+                if column.schemaReference in datasets and column.schemaReference != identifier:
+                    dependencies[node].add(('dataset', column.schemaReference))
+            elif isinstance(column, Date) and column.schemaReference:
+                name = column.schemaReference
+                date_dimensions[name] = date_dimensions.get(name, False) or column.datetime
+                dependencies[('date', name)] = set()
+                dependencies[node].add(('date', name))
+
+    return datasets, date_dimensions, dependencies
+
+
+def run_graph(tasks, dependencies, workers):
+    """
+    Run the tasks of a dependency graph in a pool of threads, a task
+    being started as soon as all its dependencies succeeded. The tasks
+    depending on a failed task are skipped.
+
+    Returns a dictionary node -> exception of the failed tasks.
+    """
+    remaining = dict((node, set(deps)) for node, deps in dependencies.iteritems())
+    dependents = dict((node, set()) for node in tasks)
+    for node, deps in dependencies.iteritems():
+        for dep in deps:
+            dependents[dep].add(node)
+
+    done = Queue()
+    errors = {}
+    pool = ThreadPool(workers)
+
+    def run(node):
+        try:
+            tasks[node]()
+            done.put((node, None))
+        except Exception, err:
+            done.put((node, err))
+
+    def skip(node):
+        errors[node] = BulkUploadFailed(
+            'Skipped %(node)s, a dependency failed', node=node
+        )
+        remaining.pop(node, None)
+        for dependent in dependents[node]:
+            if dependent in remaining:
+                skip(dependent)
+
+    running = 0
+    try:
+        while remaining or running:
+            ready = [node for node, deps in remaining.iteritems() if not deps]
+            if not ready and not running:
+                raise BulkUploadFailed(
+                    'Circular dependencies between %(nodes)s', nodes=sorted(remaining)
+                )
+            for node in ready:
+                del remaining[node]
+                pool.apply_async(run, (node,))
+                running += 1
+
+            node, err = done.get()
+            running -= 1
+            if err:
+                logger.debug('Task %s failed: %s' % (node, err))
+                errors[node] = err
+                for dependent in dependents[node]:
+                    if dependent in remaining:
+                        skip(dependent)
+            else:
+                for dependent in dependents[node]:
+                    if dependent in remaining:
+                        remaining[dependent].discard(node)
+    finally:
+        pool.close()
+        pool.join()
+
+    return errors
+
+
+def upload_datasets(project, dataset_classes, workers=4, **upload_kwargs):
+    """
+    Upload several datasets concurrently. The datasets are created,
+    uploaded and integrated as soon as the datasets they reference
+    and their date dimensions are available, so that independent
+    datasets are processed in parallel.
+
+    :param project:             the project to upload to.
+    :param dataset_classes:     the Dataset subclasses to upload.
+    :param workers:             the maximum number of concurrent uploads.
+    :param upload_kwargs:       the arguments of Dataset.upload.
+
+    Raises BulkUploadFailed if any upload failed, with the errors
+    by dataset.
+    """
+    datasets, date_dimensions, dependencies = get_upload_graph(project, dataset_classes)
+    tasks = {}
+    for identifier, dataset in datasets.iteritems():
+        tasks[('dataset', identifier)] = partial(dataset.upload, **upload_kwargs)
+    for name, include_time in date_dimensions.iteritems():
+        tasks[('date', name)] = partial(
+            DateDimension(project).create, name=name, include_time=include_time
+        )
+
+    errors = run_graph(tasks, dependencies, workers)
+    if errors:
+        raise BulkUploadFailed(
+            'Failed to upload %(failed)s', errors=errors,
+            failed=', '.join(name for _, name in sorted(errors))
+        )
@@ -0,0 +1,99 @@
+from copy import deepcopy
+import threading
+import time
+
+# how long (in seconds) the project metadata is cached by default
+METADATA_TTL = 60
+
+
+class TTLCache(object):
+    """
+    A thread-safe cache whose entries expire `ttl` seconds after
+    they were set. A ttl of 0 disables the cache.
+
+    The values are copied in and out of the cache, so that callers
+    modifying them do not change the cached ones. Each clear (or
+    invalidate) starts a new generation: a value computed from data
+    fetched before it is not cached (see `set`).
+
+    :param ttl:     the lifetime of the entries, in seconds.
+    :param clock:   the function giving the current time.
+    """
+
+    def __init__(self, ttl=METADATA_TTL, clock=time.time):
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        # key -> (expiry time, value)
+        self.entries = {}
+        self.generation = 0
+        # key -> [lock, number of threads using it] of the values
+        # being computed, see get_or_set
+        self.computing = {}
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= self.clock():
+                del self.entries[key]
+                return default
+            value = entry[1]
+        return deepcopy(value)
+
+    def set(self, key, value, generation=None):
+        """
+        Cache the value of `key`.
+
+        :param generation:  the generation read before fetching the value,
+                            which is not cached if the cache was cleared
+                            since then.
+        """
+        if self.ttl <= 0:
+            return
+        value = deepcopy(value)
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self.entries[key] = (self.clock() + self.ttl, value)
+
+    def get_or_set(self, key, compute):
+        """
+        Return the cached value of `key`, or compute it, cache it and
+        return it. The value of a key is computed by one thread at a time
+        (outside of the cache lock), the concurrent misses wait for it.
+
+        :param key:         the key of the value.
+        :param compute:     a callable returning the value.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+        with self.lock:
+            key_lock = self.computing.setdefault(key, [threading.Lock(), 0])
+            key_lock[1] += 1
+        try:
+            with key_lock[0]:
+                generation = self.generation
+                value = self.get(key, missing)
+                if value is missing:
+                    value = compute()
+                    self.set(key, value, generation)
+                return value
+        finally:
+            with self.lock:
+                key_lock[1] -= 1
+                if not key_lock[1]:
+                    del self.computing[key]
+
+    def invalidate(self, key):
+        with self.lock:
+            self.generation += 1
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
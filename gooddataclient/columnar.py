@@ -0,0 +1,205 @@
+"""
+Vectorized encoding of columnar data (a pandas DataFrame, or a dict
+of NumPy arrays) into the CSV expected by GoodData. The output is
+byte-identical to the one of RowEncoder on the same rows.
+
+NumPy is an optional dependency, only needed to upload columnar data.
+"""
+from itertools import izip
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+from gooddataclient.formatter import (
+    csv_encode, NULL, DATE_NULL, BOOL_TRUE, BOOL_FALSE, FALSY_DATES, GD_MAX_YEAR
+)
+
+# number of rows encoded at once, to bound the memory used
+COLUMNAR_BLOCK_ROWS = 100000
+
+
+def is_columnar(data):
+    """
+    Tell if the data is a pandas DataFrame or a dict of NumPy arrays.
+    """
+    if pandas is not None and isinstance(data, pandas.DataFrame):
+        return True
+    return (
+        numpy is not None and isinstance(data, dict) and bool(data) and
+        all(isinstance(values, numpy.ndarray) for values in data.itervalues())
+    )
+
+
+def get_length(data):
+    """
+    Get the number of rows of columnar data.
+    """
+    if pandas is not None and isinstance(data, pandas.DataFrame):
+        return len(data)
+    return len(data.itervalues().next()) if data else 0
+
+
+def get_column(data, name, start, stop):
+    """
+    Get the values of a column between rows `start` and `stop`,
+    as a NumPy array. A missing column is empty, like a missing
+    key in a dict row.
+    """
+    if name not in data:
+        return numpy.array([''] * (stop - start), dtype=object)
+    values = data[name]
+    if pandas is not None and isinstance(values, pandas.Series):
+        values = values.values
+    return numpy.asarray(values)[start:stop]
+
+
+def slice_columns(data, start, stop):
+    """
+    Get the rows between `start` and `stop` of columnar data.
+    """
+    if pandas is not None and isinstance(data, pandas.DataFrame):
+        return data.iloc[start:stop]
+    return dict((name, values[start:stop]) for name, values in data.iteritems())
+
+
+def iter_columnar_chunks(data, size):
+    """
+    Generator cutting columnar data into chunks of `size` rows.
+    """
+    for start in xrange(0, get_length(data), size):
+        yield slice_columns(data, start, start + size)
+
+
+def get_max(data, name):
+    """
+    Get the highest value of a column, ignoring the null values,
+    as a python object (a datetime for dates). None if there is none.
+    """
+    values = get_column(data, name, 0, get_length(data))
+    if values.dtype.kind == 'M':
+        values = values.astype('datetime64[us]')
+        values = values[~numpy.isnat(values)]
+    elif values.dtype.kind == 'f':
+        values = values[~numpy.isnan(values)]
+    elif values.dtype.kind == 'O':
+        values = values[values != numpy.array(None)]
+    if not len(values):
+        return None
+    value = values.max()
+    return value.item() if isinstance(value, numpy.generic) else value
+
+
+def to_datetime64(values):
+    """
+    Convert date values to a datetime64[us] array, the falsy dates
+    being NaT, and clamp them to GD_MAX_YEAR.
+    """
+    if values.dtype.kind != 'M':
+        values = numpy.array(values, dtype=object)
+        falsy = numpy.zeros(len(values), dtype=bool)
+        for falsy_date in FALSY_DATES:
+            falsy |= values == falsy_date
+        values[falsy] = None
+    dates = values.astype('datetime64[us]')
+
+    years = dates.astype('datetime64[Y]').astype(numpy.int64) + 1970
+    too_late = ~numpy.isnat(dates) & (years > GD_MAX_YEAR)
+    if too_late.any():
+        dates[too_late] = numpy.array([
+            date.replace(year=GD_MAX_YEAR) for date in dates[too_late].astype(object)
+        ], dtype='datetime64[us]')
+    return dates
+
+
+def encode_dates(values, is_datetime):
+    """
+    Vectorized format_dates: return a dict of the encoded
+    columns of a date field, by suffix ('', '_dt', '_tm').
+    """
+    dates = to_datetime64(values)
+    nat = numpy.isnat(dates)
+    days = dates.astype('datetime64[D]')
+
+    date_ids = (days - numpy.datetime64('1900-01-01', 'D')).astype(numpy.int64) + 1
+    date_ids[nat] = 0
+    if is_datetime:
+        # 'YYYY-MM-DDTHH:MM:SS', the 'T' is replaced in place by a space
+        date_values = numpy.datetime_as_string(dates.astype('datetime64[s]')).astype('S19')
+        date_values.view(numpy.uint8).reshape(-1, 19)[:, 10] = ord(' ')
+    else:
+        date_values = numpy.datetime_as_string(days).astype('S10')
+    date_values = date_values.astype(object)
+    date_values[nat] = DATE_NULL
+
+    encoded = {'': date_values, '_dt': date_ids.astype(str)}
+    if is_datetime:
+        seconds = (dates - days).astype('timedelta64[s]').astype(numpy.int64)
+        seconds[nat] = 0
+        encoded['_tm'] = seconds.astype(str)
+    return encoded
+
+
+def encode_values(values):
+    """
+    Vectorized csv_encode of a column, NaN being NULL.
+    """
+    kind = values.dtype.kind
+    if kind == 'b':
+        return numpy.where(values, BOOL_TRUE, BOOL_FALSE)
+    if kind in 'iu':
+        return values.astype(str)
+    if kind == 'f':
+        # str of the Python floats, as RowEncoder: numpy formats
+        # them with repr, which gives different csv values
+        encoded = numpy.frompyfunc(str, 1, 1)(values.astype(numpy.float64).astype(object))
+        encoded[numpy.isnan(values)] = NULL
+        return encoded
+    if kind == 'S':
+        return values
+    if kind == 'U':
+        return numpy.char.encode(values, 'utf-8')
+
+    values = values.astype(object)
+    encoded = numpy.frompyfunc(csv_encode, 1, 1)(values)
+    # NaN is the only value not equal to itself
+    encoded[values != values] = NULL
+    return encoded
+
+
+def encode_columns(data, row_encoder, start, stop):
+    """
+    Encode the rows between `start` and `stop` of columnar data,
+    returning the list of encoded columns, in the order of the
+    row_encoder fieldnames.
+    """
+    encoded = {}
+    for name in row_encoder.columns:
+        values = get_column(data, name, start, stop)
+        if name in row_encoder.dates or name in row_encoder.datetimes:
+            is_datetime = name in row_encoder.datetimes
+            for suffix, column in encode_dates(values, is_datetime).iteritems():
+                encoded[name + suffix] = column
+            if is_datetime:
+                encoded['tm_%s_id' % name] = encoded['%s_tm' % name]
+        else:
+            encoded[name] = encode_values(values)
+    return [encoded[name].tolist() for name in row_encoder.fieldnames]
+
+
+def iter_columnar_rows(data, row_encoder, block_rows=COLUMNAR_BLOCK_ROWS):
+    """
+    Generator of the encoded rows of columnar data, encoded by blocks
+    of `block_rows` rows, ready to be written by a csv writer.
+    """
+    length = get_length(data)
+    for start in xrange(0, length, block_rows):
+        stop = min(start + block_rows, length)
+        for row in izip(*encode_columns(data, row_encoder, start, stop)):
+            yield row
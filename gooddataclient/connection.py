@@ -1,9 +1,14 @@
+from contextlib import contextmanager
 import os
 import logging
+import sys
 import time
+from types import GeneratorType
+import uuid
 
 import simplejson as json
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import (
     HTTPError, ConnectionError
 )
@@ -11,7 +16,13 @@ from requests.exceptions import (
 from gooddataclient.exceptions import (
     AuthenticationError, GoodDataTotallyDown, get_api_msg
 )
-from gooddataclient.archiver import create_archive, DEFAULT_ARCHIVE_NAME
+from gooddataclient.metrics import RequestInfo, call_hooks, get_uri_template
+from gooddataclient.polling import Poller
+from gooddataclient.tracing import NullTracer
+from gooddataclient.archiver import (
+    create_archive, create_archive_stream, join_in_chunks,
+    DEFAULT_ARCHIVE_NAME, UPLOAD_CHUNK_SIZE
+)
 
 logger = logging.getLogger("gooddataclient")
 
@@ -20,6 +31,74 @@ JSON_HEADERS = {
     'Accept': 'application/json'
 }
 
+# default sizes of the HTTP connection pools kept by a Connection
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 10
+
+
+def create_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                   keep_alive=True):
+    """
+    Create a requests session whose connections are pooled
+    and kept alive between calls.
+
+    :param pool_connections:    number of hosts to keep a pool for.
+    :param pool_maxsize:        maximum number of connections kept
+                                in the pool of a given host.
+    :param keep_alive:          if False, every connection is closed
+                                once its response has been read.
+    """
+    session = requests.Session()
+    for prefix in ('http://', 'https://'):
+        session.mount(prefix, HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        ))
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    return session
+
+
+class CountingIterable(object):
+    """
+    Wrap the generator body of a request, to count the bytes sent.
+    """
+
+    def __init__(self, iterable):
+        self.iterable = iterable
+        self.size = 0
+
+    def __iter__(self):
+        for block in self.iterable:
+            self.size += len(block)
+            yield block
+
+
+def get_request_size(data):
+    """
+    Return the size of the request body: a string, a file,
+    or a generator wrapped in a CountingIterable.
+    """
+    if isinstance(data, basestring):
+        return len(data)
+    if isinstance(data, CountingIterable):
+        return data.size
+    if hasattr(data, 'fileno'):
+        return os.fstat(data.fileno()).st_size
+    return 0
+
+
+def get_response_size(response, stream):
+    """
+    Return the size of the response body, from its Content-Length header
+    when the body is streamed, as it is not read yet.
+    """
+    if not stream:
+        return len(response.content or '')
+    try:
+        return int(response.headers.get('content-length') or 0)
+    except ValueError:
+        return 0
+
 
 class Connection(object):
 
@@ -29,12 +108,49 @@ class Connection(object):
     TOKEN_URI = '/gdc/account/token'
     MD_URI = '/gdc/md/'
 
-    def __init__(self, username, password):
+    def __init__(self, username, password, pool_connections=POOL_CONNECTIONS,
+                 pool_maxsize=POOL_MAXSIZE, keep_alive=True, poller=None, hooks=None,
+                 tracer=None, host=None, webdav_host=None):
+        """
+        The connection owns a pooled session, shared with its webdav,
+        so that successive calls reuse the same TCP/TLS connections.
+        The session also keeps the authentication cookies.
+
+        `poller` is the default Poller used to wait for asynchronous tasks.
+
+        `hooks` is a list of hooks notified of each request (and of each
+        task polled by the default poller), see gooddataclient.metrics.
+
+        `tracer` is the Tracer of the phases of the uploads, shared with
+        the webdav, see gooddataclient.tracing.
+
+        `host` and `webdav_host` override the HOST of the API and of the
+        webdav, to use another GoodData server, or a local stand-in.
+        """
+        if host:
+            self.HOST = host
         self.username = username
         self.password = password
-        self.webdav = Webdav(username, password)
+        self.hooks = list(hooks or [])
+        self.poller = poller or Poller(hooks=self.hooks)
+        self.tracer = tracer or NullTracer()
+        self.session = create_session(pool_connections, pool_maxsize, keep_alive)
+        self.webdav = Webdav(
+            username, password, session=self.session, hooks=self.hooks,
+            tracer=self.tracer, host=webdav_host
+        )
         self.login(username, password)
 
+    def add_hook(self, hook):
+        """
+        Register a hook, notified of the requests of the connection and
+        its webdav, and of the tasks polled by the default poller.
+        A hook is an object with an on_request and/or an on_poll method,
+        Metrics for instance (see gooddataclient.metrics).
+        """
+        # the webdav and the default poller share the list of hooks
+        self.hooks.append(hook)
+
     def login(self, username, password):
         data = {
             'postUserLogin': {
@@ -43,22 +159,25 @@ class Connection(object):
                 'remember': 1,
             }
         }
-        r1 = self.post(uri=self.LOGIN_URI, data=data, login=True,
-                       raise_cls=AuthenticationError)
-        self.cookies = self.webdav.cookies = r1.cookies
+        # start from a clean session, the login sets the new cookies
+        self.session.cookies.clear()
+        self.post(uri=self.LOGIN_URI, data=data, login=True,
+                  raise_cls=AuthenticationError)
         self.get(uri=self.TOKEN_URI, raise_cls=AuthenticationError)
 
     def relogin(self):
         self.login(self.username, self.password)
 
-    def get(self, uri, raise_cls=None, err_msg=None, **kwargs):
+    def get(self, uri, raise_cls=None, err_msg=None, stream=False, **kwargs):
         logger.debug('GET: %s' % uri)
         get_data = {
             'url': self.HOST + uri,
-            'cookies': self.cookies,
             'headers': JSON_HEADERS,
             'auth': (self.username, self.password)
         }
+        if stream:
+            # the body is read on demand, see Response.iter_content
+            get_data['stream'] = True
         return self.request('get', get_data, raise_cls, err_msg, **kwargs)
 
     def post(
@@ -72,9 +191,6 @@ class Connection(object):
             'headers': headers,
             'auth': (self.username, self.password)
         }
-        if not login:
-            post_data['cookies'] = self.cookies
-
         return self.request('post', post_data, raise_cls, err_msg, **kwargs)
 
     def delete(self, uri, raise_cls=None, err_msg=None, **kwargs):
@@ -86,8 +202,15 @@ class Connection(object):
         return self.request('delete', delete_data, raise_cls, err_msg, **kwargs)
 
     def request(self, call_method, call_arguments, raise_cls, err_msg, **err_arguments):
+        # a hook added meanwhile is notified from the next request on
+        hooks = list(self.hooks)
+        if hooks and isinstance(call_arguments.get('data'), GeneratorType):
+            # the streamed bodies are counted as they are sent
+            call_arguments['data'] = CountingIterable(call_arguments['data'])
+        started = time.time()
+        response = None
         try:
-            response = requests.request(method=call_method, **call_arguments)
+            response = self.session.request(method=call_method, **call_arguments)
             response.raise_for_status()
         except HTTPError, err:
             if raise_cls:
@@ -103,53 +226,125 @@ class Connection(object):
             raise
         except ConnectionError, err:
             raise GoodDataTotallyDown(err.message)
+        finally:
+            if hooks:
+                self.notify_request(
+                    hooks, call_method, call_arguments, response, time.time() - started
+                )
         return response
 
-    def poll_gd_response(self, uri, status_field, ErrorClass, err_json=None):
+    def notify_request(self, hooks, call_method, call_arguments, response, latency):
         """
-        This function is useful to poll a given uri. It looks
-        at the `status_field` to know the status of the task.
+        Report a request to the hooks, `response` being None
+        if the server could not be reached.
+        """
+        data = call_arguments.get('data')
+        call_hooks(hooks, 'on_request', RequestInfo(
+            method=call_method.upper(),
+            uri=call_arguments['url'],
+            template=get_uri_template(call_arguments['url']),
+            status=response.status_code if response is not None else None,
+            bytes_in=(
+                get_response_size(response, call_arguments.get('stream', False))
+                if response is not None else 0
+            ),
+            bytes_out=get_request_size(data),
+            latency=latency,
+        ))
+
+    def get_gd_status_check(self, uri, status_field, ErrorClass, err_json=None):
+        """
+        Build the check function used by the poller to know the status
+        of the task at `uri`, by looking at its `status_field`.
 
         In case of failure, it will raise an error of the type
         ErrorClass, with an extra information defined by `err_json`.
         """
-        while True:
+        def check():
             status = response = self.get(uri=uri).json()
 
             for field in status_field.split('.'):
                 status = status[field]
             logger.debug(status)
-            if status == 'OK':
-                break
             if status in ('ERROR', 'WARNING'):
-                err_json = err_json or {}
                 err_msg = 'An error occured while polling uri %(uri)s'
                 raise ErrorClass(
                     err_msg, response=response,
-                    custom_error=err_json, uri=uri
+                    custom_error=err_json or {}, uri=uri
                 )
+            return status == 'OK', response
+
+        return check
+
+    def poll_gd_response(self, uri, status_field, ErrorClass, err_json=None, poller=None):
+        """
+        This function is useful to poll a given uri. It looks
+        at the `status_field` to know the status of the task.
+
+        In case of failure, it will raise an error of the type
+        ErrorClass, with an extra information defined by `err_json`.
+
+        The waiting policy is given by `poller`, which defaults
+        to the connection's poller.
+        """
+        check = self.get_gd_status_check(uri, status_field, ErrorClass, err_json)
+        return (poller or self.poller).poll(check, uri)
+
+    def iter_poll_gd_responses(self, tasks, poller=None):
+        """
+        Poll several tasks concurrently, and yield the tuples
+        (uri, response) as soon as each task is done.
+
+        :param tasks:       a list of tuples (uri, status_field,
+                            ErrorClass, err_json), see `poll_gd_response`.
+        :param poller:      defaults to the connection's poller.
+        """
+        checks = [
+            (task[0], self.get_gd_status_check(*task)) for task in tasks
+        ]
+        return (poller or self.poller).iter_poll_all(checks)
+
+    def poll_gd_responses(self, tasks, poller=None):
+        """
+        Wait for several tasks at once, the total waiting time is the one
+        of the slowest task. Returns a dictionary uri -> last response.
 
-            time.sleep(0.5)
+        See `iter_poll_gd_responses`.
+        """
+        return dict(self.iter_poll_gd_responses(tasks, poller))
 
-    def poll_server_response(self, uri, ErrorClass, err_json):
+    def poll_server_response(self, uri, ErrorClass, err_json, poller=None):
         '''
         This function is usefulto poll an uri, looking at
         the server's response field to know the status.
         '''
-        while True:
-            response = self.get(uri)
+        check = self.get_server_status_check(uri, ErrorClass, err_json)
+        return (poller or self.poller).poll(check, uri)
+
+    def get_server_status_check(self, uri, ErrorClass, err_json, stream=False):
+        '''
+        Build the check function used by the poller to know the
+        status of the task at `uri`: done once the server replies 200,
+        pending while it replies 202.
+
+        @param stream: if True, the body of the final response is
+                       read on demand (see Response.iter_content)
+        '''
+        def check():
+            response = self.get(uri, stream=stream)
             status = response.status_code
-            if status == 200:
-                break
-            if status == 202:
-                time.sleep(0.5)
-            else:
+            if status not in (200, 202):
                 err_msg = 'An error occured while polling uri %(uri)s'
                 raise ErrorClass(
                     err_msg, response=response,
                     custom_error=err_json, uri=uri
                 )
-        return response
+            if status == 202 and stream:
+                # read the body, to release the connection
+                response.content
+            return status == 200, response
+
+        return check
 
     def get_metadata(self):
         return self.get(self.MD_URI).json()
@@ -160,14 +355,21 @@ class Webdav(Connection):
     HOST = 'https://secure-di.gooddata.com'
     UPLOADS_URI = '/uploads/%s/'
 
-    def __init__(self, username, password):
+    def __init__(self, username, password, session=None, hooks=None, tracer=None,
+                 host=None):
+        if host:
+            self.HOST = host
         self.username = username
         self.password = password
+        self.session = session or create_session()
+        self.hooks = hooks if hooks is not None else []
+        self.tracer = tracer or NullTracer()
 
     def upload(
         self, data, sli_manifest, dates=[], datetimes=[],
         keep_csv=False, csv_file=None, no_upload=False,
-        csv_input_path=None
+        csv_input_path=None, chunk_size=UPLOAD_CHUNK_SIZE, stream=False,
+        row_encoder=None, workers=None
     ):
         '''Create zip file with data in csv format and manifest file, then create
         directory in webdav and upload the zip file there.
@@ -181,45 +383,138 @@ class Webdav(Connection):
         @param no_upload: do the upload or not
         @param csv_input_path: push data from a csv instead of
                               data from the `data` parameter
+        @param chunk_size: size (in bytes) of the blocks streamed
+                           to webdav, when `stream` is True
+        @param stream: zip the data on the fly, straight into the
+                       webdav request, without any temporary file
+        @param row_encoder: the RowEncoder of the data rows, compiled
+                            from the sli_manifest if None
+        @param workers: if more than 1, the number of processes
+                        encoding the data rows
 
         return the name of the temporary file, hence the name of the directory
         created in webdav uploads folder
         '''
+        if stream:
+            return self.upload_stream(
+                data, sli_manifest, dates, datetimes, keep_csv,
+                no_upload, csv_input_path, chunk_size, row_encoder, workers
+            )
+
         archive = create_archive(
             data, sli_manifest, dates, datetimes,
-            keep_csv, csv_file, csv_input_path
+            keep_csv, csv_file, csv_input_path, row_encoder, workers, self.tracer
         )
         if no_upload:
             os.remove(archive)
             return csv_file
 
+        return self.upload_archive(archive)
+
+    def upload_archive(self, archive):
+        '''Create a directory in webdav, upload the zip file there
+        and remove it. The file is sent with its Content-Length,
+        read by blocks, without being loaded in memory.
+
+        @param archive: path of the zip file
+
+        return the name of the directory created in webdav uploads folder
+        '''
         dir_name = os.path.basename(archive)
-        # create the folder on WebDav
-        self.mkcol(uri=self.UPLOADS_URI % dir_name)
-        # open the files to read them
-        f_archive = open(archive, 'rb')
+        try:
+            # create the folder on WebDav
+            with self.tracer.span('mkcol'):
+                self.mkcol(uri=self.UPLOADS_URI % dir_name)
+            # send the file itself, rather than a generator of its blocks,
+            # so that its size is known: no chunked transfer encoding
+            archive_uri = ''.join((self.UPLOADS_URI % dir_name, DEFAULT_ARCHIVE_NAME))
+            with self.tracer.span('put') as span, self.delete_on_error(dir_name):
+                with open(archive, 'rb') as f_archive:
+                    self.put(uri=archive_uri, data=f_archive,
+                             headers={'Content-Type': 'application/zip'})
+                if span.recording:
+                    span.set(bytes=os.path.getsize(archive))
+        finally:
+            # remove the files
+            os.remove(archive)
 
-        # upload the files to WebDav
-        archive_uri = ''.join((self.UPLOADS_URI % dir_name, DEFAULT_ARCHIVE_NAME))
-        self.put(uri=archive_uri, data=f_archive.read(),
-                 headers={'Content-Type': 'application/zip'})
+        return dir_name
 
-        # close and remove the files
-        f_archive.close()
-        os.remove(archive)
+    def upload_stream(
+        self, data, sli_manifest, dates=[], datetimes=[], keep_csv=False,
+        no_upload=False, csv_input_path=None, chunk_size=UPLOAD_CHUNK_SIZE,
+        row_encoder=None, workers=None
+    ):
+        '''Encode the data in csv format, zip it with the manifest file and
+        push it to webdav on the fly, so that encoding, compression and
+        network transfer overlap and nothing is written to disk.
+
+        See `upload` for the parameters.
+
+        return the name of the directory created in webdav uploads folder
+        '''
+        if keep_csv:
+            raise TypeError('Keep csv option is not available when streaming')
+        archive = create_archive_stream(
+            data, sli_manifest, dates, datetimes, csv_input_path, row_encoder, workers
+        )
+        if no_upload:
+            # still encode the data, to behave like a dry run
+            for _ in archive:
+                pass
+            return None
+
+        dir_name = 'tmp%s' % uuid.uuid4().hex
+        with self.tracer.span('mkcol'):
+            self.mkcol(uri=self.UPLOADS_URI % dir_name)
+        archive_uri = ''.join((self.UPLOADS_URI % dir_name, DEFAULT_ARCHIVE_NAME))
+        # the data is encoded and zipped while it is sent,
+        # so these phases are part of the put span
+        with self.tracer.span('put', streamed=True) as span, self.delete_on_error(dir_name):
+            blocks = join_in_chunks(archive, chunk_size)
+            if span.recording:
+                blocks = CountingIterable(blocks)
+            self.put(uri=archive_uri, data=blocks,
+                     headers={'Content-Type': 'application/zip'})
+            if span.recording:
+                span.set(bytes=blocks.size)
 
         return dir_name
 
+    @contextmanager
+    def delete_on_error(self, dir_name):
+        '''Delete the webdav directory if the enclosed block fails,
+        the PUT of its archive for instance, and re-raise the error.
+        '''
+        try:
+            yield
+        except Exception:
+            exc_info = sys.exc_info()
+            try:
+                self.delete(dir_name)
+            except Exception, err:
+                logger.debug('Failed to delete webdav directory %s: %s' % (dir_name, err))
+            raise exc_info[0], exc_info[1], exc_info[2]
+
     def mkcol(self, uri):
         logger.debug('MKCOL: %s' % uri)
-        r = requests.request(method='MKCOL', url=self.HOST + uri, auth=(self.username, self.password))
-        r.raise_for_status()
+        mkcol_data = {
+            'url': self.HOST + uri,
+            'auth': (self.username, self.password)
+        }
+        self.request('MKCOL', mkcol_data, None, None)
 
     def put(self, uri, data, headers):
         logger.debug('PUT: %s' % uri)
-        r = requests.put(url=self.HOST + uri, data=data, headers=headers, auth=(self.username, self.password))
-        r.raise_for_status()
+        put_data = {
+            'url': self.HOST + uri,
+            'data': data,
+            'headers': headers,
+            'auth': (self.username, self.password)
+        }
+        self.request('put', put_data, None, None)
 
     def delete(self, dir_name):
         uri = self.UPLOADS_URI % dir_name
-        super(Webdav, self).delete(uri=uri)
+        with self.tracer.span('delete'):
+            super(Webdav, self).delete(uri=uri)
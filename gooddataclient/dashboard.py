@@ -1,8 +1,13 @@
+import hashlib
 import urllib2
 import logging
 import os
 
-from gooddataclient.exceptions import DashboardExportError
+import simplejson as json
+
+from gooddataclient.batch import run_batch
+from gooddataclient.cache import TTLCache
+from gooddataclient.exceptions import DashboardExportError, BatchExportFailed
 
 logger = logging.getLogger("gooddataclient")
 
@@ -19,6 +24,13 @@ class Dashboard(object):
 
     err_msg = 'An error occured while exporting dashboard %(id)s'
 
+    # GD expires the execution contexts after a while, they are
+    # reused for at most EXECUTION_CONTEXT_TTL seconds
+    EXECUTION_CONTEXT_TTL = 5 * 60
+    # (host, project, user, filters hash) -> execution context uri,
+    # shared by the dashboards, see _get_execution_context
+    _execution_contexts = TTLCache(EXECUTION_CONTEXT_TTL)
+
     # In GD, when looking at a dashboard, the url is like obj/DASHBOARD_ID|TAB_ID
     # DASHBOARD_ID is the ID of the container of all the dashboards
     DASHBOARD_ID = None
@@ -41,7 +53,7 @@ class Dashboard(object):
         self.client_export_response_uri = None
         self.pdf_data = None
 
-    def save_as_pdf(self, common_filters, wildcard_filter, output_path):
+    def save_as_pdf(self, common_filters, wildcard_filter, output_path, poller=None):
         '''
         Saves the exported dashboard as pdf.
         First retrieves an execution_context,
@@ -58,6 +70,9 @@ class Dashboard(object):
                                     used in the client export.
                                     This filter uses objects names.
         ex: wildcard_filter = {'attribute': 'label.page.page_name', 'value': 'fake_page'}
+
+        :param poller:              the Poller used to wait for the export,
+                                    defaults to the connection's one.
         '''
         logger.debug(
             'Exporting dashboard %(dashboard_name)s with filters %(common_filters)s'
@@ -68,10 +83,55 @@ class Dashboard(object):
             }
         )
 
-        self._poll_for_dashboard_data(common_filters, wildcard_filter)
+        self._poll_for_dashboard_data(common_filters, wildcard_filter, poller)
+        self._write_pdf(self.pdf_data, output_path)
 
+    def export_pdfs(self, exports, workers=4, poller=None):
+        '''
+        Export the dashboard as pdf for many filter combinations
+        concurrently: the client exports are requested by a pool of
+        `workers` threads, each of them is polled from a single loop
+        as soon as it is requested, and each pdf is streamed to its own file by the pool as
+        soon as it is ready (see run_batch). The execution context of
+        each distinct set of common filters is retrieved only once.
+
+        :param exports:     a list of tuples (common_filters,
+                            wildcard_filter, output_path), see save_as_pdf.
+        :param workers:     the maximum number of concurrent requests.
+        :param poller:      the Poller used to wait for the exports,
+                            defaults to the connection's one.
+
+        Raises BatchExportFailed with the errors by index if any export
+        failed, the other pdfs being written anyway.
+        '''
+        # the worker threads share the dashboard, the uris are kept
+        # local instead of being stored in its attributes
+        def start((common_filters, wildcard_filter, _)):
+            return self._request_client_export(
+                wildcard_filter, self._get_cached_execution_context(common_filters)
+            )
+
+        def get_check((_, wildcard_filter, __), poll_uri):
+            return self.connection.get_server_status_check(
+                poll_uri, DashboardExportError,
+                {'id': self.id, 'wildcard_filter': wildcard_filter}, stream=True
+            )
+
+        def finish((_, __, output_path), response):
+            self._write_pdf(response, output_path)
+
+        _, errors = run_batch(
+            exports, start, get_check, finish, poller or self.connection.poller, workers
+        )
+        if errors:
+            raise BatchExportFailed(
+                'Failed to export dashboard %(id)s for %(failed)s', id=self.id, errors=errors,
+                failed=', '.join(str(exports[index][1]) for index in sorted(errors))
+            )
+
+    def _write_pdf(self, response, output_path):
         with open(output_path, 'wb') as handle:
-            for block in self.pdf_data.iter_content(1024):
+            for block in response.iter_content(1024):
                 if not block:
                     break
                 handle.write(block)
@@ -82,7 +142,7 @@ class Dashboard(object):
         '''
         return os.path.getsize(pdf_path) == self.EMPTY_SIZE
 
-    def _poll_for_dashboard_data(self, common_filters, wildcard_filter):
+    def _poll_for_dashboard_data(self, common_filters, wildcard_filter, poller=None):
         '''
         Poll and retrieve the dashboard data, third step of the dashboard download
         '''
@@ -93,15 +153,24 @@ class Dashboard(object):
             DashboardExportError, err_json={
                 'id': self.id,
                 'wildcard_filter': wildcard_filter
-            }
+            }, poller=poller
         )
 
     def _get_client_export(self, common_filters, wildcard_filter):
         '''
-        Retrieve the client export, second step of the dashboard download
+        Retrieve the client export, second step of the dashboard download,
+        and return its poll uri.
         '''
-        self._get_execution_context(common_filters)
+        self.client_export_response_uri = self._request_client_export(
+            wildcard_filter, self._get_execution_context(common_filters)
+        )
+        return self.client_export_response_uri
 
+    def _request_client_export(self, wildcard_filter, execution_context_uri):
+        '''
+        Request the client export of an execution context, and return
+        its poll uri.
+        '''
         client_export_uri = self.CLIENT_EXPORT_URI % {
             'project_id': self.project.id
         }
@@ -114,7 +183,7 @@ class Dashboard(object):
                 "url": self.connection.HOST + "/dashboard.html" + wildcard_filter
                 + "#project=/gdc/projects/" + self.project.id
                 + "&dashboard=/gdc/md/" + self.project.id + "/obj/" + self.dashboard_id
-                + "&tab=" + self.id + "&export=1&ctx=" + self.execution_context_response_uri,
+                + "&tab=" + self.id + "&export=1&ctx=" + execution_context_uri,
                 "name": self.name
             }
         }
@@ -125,11 +194,32 @@ class Dashboard(object):
             raise_cls=DashboardExportError,
             err_msg=self.err_msg % {'id': self.id}
         )
-        self.client_export_response_uri = client_export_response.json()['asyncTask']['link']['poll']
+        return client_export_response.json()['asyncTask']['link']['poll']
 
     def _get_execution_context(self, common_filters):
         '''
-        Retrieve the execution context, first step of the dashboard download.
+        Retrieve the execution context, first step of the dashboard download,
+        and return its uri.
+        '''
+        self.execution_context_response_uri = self._get_cached_execution_context(common_filters)
+        return self.execution_context_response_uri
+
+    def _get_cached_execution_context(self, common_filters):
+        '''
+        Return the uri of the execution context of common_filters. The
+        execution contexts are cached by host, project, user and
+        common_filters, so that the exports with the same common
+        filters share the same execution context.
+        '''
+        filters_hash = hashlib.sha1(json.dumps(common_filters, sort_keys=True)).hexdigest()
+        return self._execution_contexts.get_or_set(
+            (self.connection.HOST, self.project.id, self.user_id, filters_hash),
+            lambda: self._create_execution_context(common_filters)
+        )
+
+    def _create_execution_context(self, common_filters):
+        '''
+        Create a new execution context, and return its uri.
         '''
         logger.debug('Retrieving the execution context')
 
@@ -161,4 +251,4 @@ class Dashboard(object):
             raise_cls=DashboardExportError,
             err_msg=self.err_msg % {'id': self.id}
         )
-        self.execution_context_response_uri = execution_context_response.json()['uri']
+        return execution_context_response.json()['uri']
@@ -9,19 +9,41 @@ from gooddataclient.columns import (
     Column, Date, Attribute, ConnectionPoint, Label, Reference, Fact
 )
 from gooddataclient.text import to_identifier, to_title
-from gooddataclient.archiver import CSV_DATA_FILENAME
+from gooddataclient.archiver import (
+    CSV_DATA_FILENAME, UPLOAD_CHUNK_SIZE, EncoderPool, create_archive, get_fieldnames,
+    use_workers
+)
+from gooddataclient.formatter import RowEncoder
+from gooddataclient.columnar import is_columnar, iter_columnar_chunks, get_length, get_max
+from gooddataclient.pipeline import Pipeline, iter_chunks, iter_slices
 from gooddataclient.schema.maql import (
     SYNCHRONIZE, SYNCHRONIZE_PRESERVE, CP_DEFAULT_NAME, CP_DEFAULT_CREATE
 )
 from gooddataclient.schema.state import State
+from gooddataclient.tracing import count_rows
+from gooddataclient.watermarks import HighWatermark
 
 
 logger = logging.getLogger("gooddataclient")
 
+# the keyword arguments of Dataset.upload which are not given to data(),
+# with their default values
+UPLOAD_OPTIONS = {
+    'chunk_size': UPLOAD_CHUNK_SIZE,
+    'stream': False,
+    'chunk_rows': None,
+    'max_in_flight': 2,
+    'workers': None,
+    'fingerprints': None,
+    'watermarks': None,
+}
+
 
 class Dataset(State):
 
     DATASETS_URI = '/gdc/md/%s/data/sets'
+    # dataset class -> RowEncoder, compiled once per class
+    _row_encoders = {}
 
     def __init__(self, project=None):
         super(Dataset, self).__init__(project)
@@ -49,6 +71,8 @@ class Dataset(State):
         column_order = None
         schema_name = None
         project_name = None
+        # the column whose highest uploaded value is tracked, see upload
+        watermark_column = None
 
     @classmethod
     def get_synchronize_statement(cls, schema_name, preserve=False):
@@ -118,8 +142,7 @@ class Dataset(State):
             'suffix': suffix,
         }
 
-        for col_uri in col_uris:
-            col_json = self.get_column_detail(col_uri)
+        for col_json in self.get_column_details(col_uris):
             if col_json['meta']['identifier'] == col_identifier:
                 if (not title or (title and col_json['meta']['title'] == title)):
                     return True
@@ -142,8 +165,7 @@ class Dataset(State):
             'label_name': label_name,
         }
 
-        for col_uri in col_uris['attributes'] + col_uris['facts']:
-            col_json = self.get_column_detail(col_uri)
+        for col_json in self.get_column_details(col_uris['attributes'] + col_uris['facts']):
             for display in col_json['content'].get('displayForms', []):
                 if re.match(label_identifier_re, display['meta']['identifier']):
                     if (not title or (title and display['meta']['title'] == title)):
@@ -161,7 +183,10 @@ class Dataset(State):
 
     def delete(self, name):
         dataset = self.get_metadata(name)
-        return self.connection.delete(uri=dataset['meta']['uri'])
+        try:
+            return self.connection.delete(uri=dataset['meta']['uri'])
+        finally:
+            self.project.metadata_cache.clear()
 
     def data(self, *args, **kwargs):
         raise NotImplementedError
@@ -187,6 +212,21 @@ class Dataset(State):
 
         return dates, datetimes
 
+    def get_row_encoder(self):
+        """
+        Get the RowEncoder of the dataset rows, compiled once per
+        dataset class from its columns.
+        """
+        try:
+            return self._row_encoders[self.__class__]
+        except KeyError:
+            dates, datetimes = self.get_datetime_column_names()
+            fieldnames = get_fieldnames(self.get_sli_manifest())
+            row_encoder = self._row_encoders[self.__class__] = RowEncoder(
+                fieldnames, dates, datetimes
+            )
+            return row_encoder
+
     def create(self):
         for date_dimension in self.get_date_dimension():
             DateDimension(self.project).create(name=date_dimension.schemaReference,
@@ -206,26 +246,214 @@ class Dataset(State):
         If `no_upload` is set to True, no dataset is
         created nor uploaded on the project.
 
+        The rows of data() can be dicts keyed by column name, or
+        sequences (tuples, namedtuples, cursor rows) of the column
+        values in the dataset order (`Meta.column_order`).
+        data() can also return columnar data, a pandas DataFrame or
+        a dict of NumPy arrays keyed by column name, which is encoded
+        column by column (see gooddataclient.columnar).
+
         If `keep_csv` is set to True, a csv dump is kept, in
         the file given by `csv_file`.
+
+        The other arguments are given to data(), except the keyword
+        arguments of UPLOAD_OPTIONS (chunk_size, stream, chunk_rows,
+        max_in_flight, workers, fingerprints and watermarks), which
+        tune the upload as described below.
+
+        The archive is sent to webdav from its temporary file, so the
+        memory used does not grow with the dataset. If `stream` is set
+        to True, the data is encoded and zipped on the fly while it is
+        uploaded in blocks of `chunk_size` bytes, without temporary files.
+
+        If `chunk_rows` is set, the data is uploaded incrementally
+        by chunks of `chunk_rows` rows, see `upload_chunks`.
+
+        If `workers` is more than 1, the rows are encoded as csv in
+        that many processes. A list of rows is inherited by the
+        processes, the other rows are pickled to them, so they must
+        be picklable (see gooddataclient.archiver.EncoderPool).
+
+        If `fingerprints` is a RowFingerprints store, only the rows
+        which are new or changed since the last upload are uploaded,
+        the rows being identified by their ConnectionPoint value. The
+        store is updated once the data is integrated, and rebuilt from
+        all the rows on `full_upload`.
+
+        If `watermarks` is a Watermarks store, the highest value of the
+        `Meta.watermark_column` column uploaded so far is given to data()
+        as its `watermark` argument (None the first time), so that only
+        the new rows are extracted. The new highest value is stored once
+        the data is integrated.
+
+        The phases of the upload are traced in spans of the connection's
+        tracer, children of an `upload` span which counts the uploaded
+        rows (see gooddataclient.tracing).
+        """
+        options = dict(
+            (name, kwargs.pop(name, default)) for name, default in UPLOAD_OPTIONS.iteritems()
+        )
+        if options['chunk_rows'] and (
+                keep_csv or no_upload or full_upload or csv_input_path or options['stream']):
+            raise TypeError(
+                'Chunked uploads are incremental uploads of data(), '
+                'without csv files nor streaming'
+            )
+        with self.connection.tracer.span('upload', dataset=self.identifier) as upload_span:
+            self._upload(
+                upload_span, args, kwargs, keep_csv=keep_csv, csv_file=csv_file,
+                no_upload=no_upload, full_upload=full_upload, csv_input_path=csv_input_path,
+                **options
+            )
+
+    def _upload(self, upload_span, args, kwargs, keep_csv, csv_file, no_upload, full_upload,
+                csv_input_path, chunk_size, stream, chunk_rows, max_in_flight, workers,
+                fingerprints, watermarks):
+        """
+        Upload the dataset data (see upload), in the `upload_span` span,
+        data() being called with `args` and `kwargs`.
         """
+        tracer = self.connection.tracer
         if not no_upload:
             try:
-                self.get_metadata(self.schema_name)
+                with tracer.span('metadata'):
+                    self.get_metadata(self.schema_name)
             except DataSetNotFoundError:
-                self.create()
+                with tracer.span('create'):
+                    self.create()
+
+        watermark = None
+        if watermarks is not None:
+            if not self.Meta.watermark_column or csv_input_path:
+                raise TypeError('Watermarks need data() and a Meta.watermark_column')
+            watermark = HighWatermark(
+                self.Meta.watermark_column, self.get_row_encoder().columns,
+                watermarks.get(self.identifier)
+            )
+            kwargs['watermark'] = watermark.value
+
+        if not csv_input_path:
+            # a generator is only consumed while it is encoded
+            with tracer.span('data'):
+                data = self.data(*args, **kwargs)
+        else:
+            data = None
+        if watermark is not None:
+            if is_columnar(data):
+                watermark.update(get_max(data, watermark.column))
+            else:
+                data = watermark.track(data)
+        if fingerprints is not None:
+            if not self._has_cp or csv_input_path or is_columnar(data):
+                raise TypeError(
+                    'Row fingerprints need rows of data() identified by a ConnectionPoint'
+                )
+            changes = {}
+            data = fingerprints.iter_changed_rows(
+                self.identifier, data, self.get_row_encoder(),
+                self._connection_point, changes, full_upload
+            )
+        if upload_span.recording and data is not None:
+            if is_columnar(data):
+                upload_span.set(rows=get_length(data))
+            elif isinstance(data, (list, tuple)):
+                upload_span.set(rows=len(data))
+            elif not isinstance(data, str):
+                data = count_rows(data, upload_span)
+
+        if chunk_rows:
+            self.upload_chunks(data, chunk_rows, max_in_flight, workers)
+            if fingerprints is not None:
+                fingerprints.update(self.identifier, changes)
+            if watermark is not None:
+                watermarks.set(self.identifier, watermark.value)
+            return
 
-        data = self.data(*args, **kwargs) if not csv_input_path else None
         dates, datetimes = self.get_datetime_column_names()
         dir_name = self.connection.webdav.upload(
             data, self.get_sli_manifest(full_upload),
             dates, datetimes, keep_csv, csv_file, no_upload,
-            csv_input_path
+            csv_input_path, chunk_size, stream, self.get_row_encoder(), workers
         )
 
         if not no_upload:
             self.project.integrate_uploaded_data(dir_name)
             self.connection.webdav.delete(dir_name)
+            if fingerprints is not None:
+                fingerprints.update(self.identifier, changes, replace=full_upload)
+            if watermark is not None:
+                watermarks.set(self.identifier, watermark.value)
+
+    def upload_chunks(self, data, chunk_rows, max_in_flight=2, workers=None):
+        """
+        Upload the data incrementally, by chunks of `chunk_rows` rows.
+        The chunks go through a pipeline, so that chunk k+1 is encoded
+        and zipped while chunk k is uploaded and chunk k-1 is integrated.
+        At most `max_in_flight` chunks wait between two steps.
+
+        :param data:            the rows to upload, or columnar data
+        :param chunk_rows:      the number of rows per chunk
+        :param max_in_flight:   the number of chunks waiting between two steps
+        :param workers:         the number of processes encoding the chunks,
+                                forked once for all of them
+        """
+        webdav = self.connection.webdav
+        tracer = self.connection.tracer
+        sli_manifest = self.get_sli_manifest(full_upload=False)
+        dates, datetimes = self.get_datetime_column_names()
+        row_encoder = self.get_row_encoder()
+        # forked before the threads of the pipeline are started, the
+        # processes inherit the rows of a list (see EncoderPool)
+        encoder_pool = (
+            EncoderPool(sli_manifest, row_encoder, workers, data)
+            if use_workers(data, workers) else None
+        )
+
+        def archive(rows):
+            return create_archive(
+                rows, sli_manifest, dates, datetimes,
+                row_encoder=row_encoder, tracer=tracer, encoder_pool=encoder_pool
+            )
+
+        def upload(archive):
+            return webdav.upload_archive(archive)
+
+        def integrate(dir_name):
+            try:
+                self.project.integrate_uploaded_data(dir_name)
+            finally:
+                webdav.delete(dir_name)
+
+        def discard(item, stage_index):
+            if stage_index == 1:
+                os.remove(item)
+            else:
+                webdav.delete(item)
+
+        # the spans of the pipeline threads are children of the span
+        # running this upload
+        parent = tracer.get_current_span()
+
+        def traced(function):
+            def run_traced(*args):
+                with tracer.activate(parent):
+                    return function(*args)
+            return run_traced
+
+        pipeline = Pipeline(
+            [traced(archive), traced(upload), traced(integrate)], max_in_flight, traced(discard)
+        )
+        if is_columnar(data):
+            chunks = iter_columnar_chunks(data, chunk_rows)
+        elif isinstance(data, (list, tuple)):
+            chunks = iter_slices(data, chunk_rows)
+        else:
+            chunks = iter_chunks(data, chunk_rows)
+        try:
+            pipeline.run(chunks)
+        finally:
+            if encoder_pool is not None:
+                encoder_pool.close()
 
     def get_folders(self):
         attribute_folders, fact_folders = [], []
@@ -84,5 +84,21 @@ class RowDeletionError(GoodDataClientError):
     pass
 
 
+class BulkUploadFailed(GoodDataClientError):
+    pass
+
+
+class BatchExportFailed(GoodDataClientError):
+    pass
+
+
+class PollingTimeout(GoodDataClientError):
+    pass
+
+
+class PollingCancelled(GoodDataClientError):
+    pass
+
+
 def get_api_msg(err_json):
     return err_json['message'] % tuple(err_json['parameters'])
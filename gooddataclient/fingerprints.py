@@ -0,0 +1,126 @@
+from contextlib import closing
+import hashlib
+from itertools import islice
+import logging
+import sqlite3
+import threading
+
+from gooddataclient.formatter import EncodedRow
+
+logger = logging.getLogger("gooddataclient")
+
+# number of keys looked up in the store at once (sqlite allows 999 variables)
+LOOKUP_BATCH_SIZE = 500
+# separates the encoded values of a row when computing its fingerprint
+FIELD_SEPARATOR = '\x1f'
+
+
+def get_fingerprint(encoded_row):
+    """
+    Get the fingerprint of a row, from its encoded values.
+    """
+    return hashlib.sha1(FIELD_SEPARATOR.join(encoded_row)).digest()
+
+
+class RowFingerprints(object):
+    """
+    A local store of the fingerprints of the rows uploaded to GoodData,
+    keyed by dataset and ConnectionPoint value, kept in a sqlite file.
+    It allows incremental uploads to skip the rows which did not change
+    since the last upload.
+
+    :param path:    the path of the sqlite file, created if needed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        # the keys are utf-8 encoded values, like the csv ones
+        self.db.text_factory = str
+        with self.lock, self.db:
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS fingerprints ('
+                'dataset TEXT, key TEXT, fingerprint BLOB, '
+                'PRIMARY KEY (dataset, key))'
+            )
+
+    def close(self):
+        self.db.close()
+
+    def get(self, dataset, keys):
+        """
+        Return a dictionary key -> fingerprint of the known keys.
+        """
+        keys = list(keys)
+        fingerprints = {}
+        with self.lock, closing(self.db.cursor()) as cursor:
+            for start in xrange(0, len(keys), LOOKUP_BATCH_SIZE):
+                batch = keys[start:start + LOOKUP_BATCH_SIZE]
+                cursor.execute(
+                    'SELECT key, fingerprint FROM fingerprints '
+                    'WHERE dataset = ? AND key IN (%s)' % ', '.join('?' * len(batch)),
+                    [dataset] + batch
+                )
+                fingerprints.update((key, str(fingerprint)) for key, fingerprint in cursor)
+        return fingerprints
+
+    def update(self, dataset, fingerprints, replace=False):
+        """
+        Record the fingerprints of uploaded rows.
+
+        :param dataset:         the dataset identifier.
+        :param fingerprints:    a dictionary key -> fingerprint.
+        :param replace:         if True, the fingerprints of the
+                                dataset are replaced by these ones.
+        """
+        with self.lock, self.db:
+            if replace:
+                self.db.execute('DELETE FROM fingerprints WHERE dataset = ?', (dataset,))
+            self.db.executemany(
+                'INSERT OR REPLACE INTO fingerprints (dataset, key, fingerprint) VALUES (?, ?, ?)',
+                ((dataset, key, sqlite3.Binary(fingerprint))
+                 for key, fingerprint in fingerprints.iteritems())
+            )
+        logger.debug('Recorded %d row fingerprints of %s' % (len(fingerprints), dataset))
+
+    def clear(self, dataset):
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM fingerprints WHERE dataset = ?', (dataset,))
+
+    def iter_changed_rows(self, dataset, rows, row_encoder, key_column,
+                          changes, full_upload=False):
+        """
+        Generator of the rows which are new or changed since they were
+        recorded. The rows are encoded to be fingerprinted, so they are
+        yielded encoded, as EncodedRows which the row_encoder does not
+        encode again. The fingerprints of these rows are added to
+        `changes`, to be recorded with `update` once the upload succeeded.
+
+        :param dataset:         the dataset identifier.
+        :param rows:            the rows to upload (dicts or sequences).
+        :param row_encoder:     the RowEncoder of the rows.
+        :param key_column:      the name of the ConnectionPoint column.
+        :param changes:         the dictionary key -> fingerprint to fill.
+        :param full_upload:     if True, all the rows are yielded.
+        """
+        key_index = row_encoder.fieldnames.index(key_column)
+        iterator = iter(rows)
+        skipped = 0
+        while True:
+            batch = [
+                EncodedRow(row_encoder(row)) for row in islice(iterator, LOOKUP_BATCH_SIZE)
+            ]
+            if not batch:
+                break
+            known = {} if full_upload else self.get(
+                dataset, set(encoded[key_index] for encoded in batch)
+            )
+            for encoded in batch:
+                key, fingerprint = encoded[key_index], get_fingerprint(encoded)
+                if known.get(key) == fingerprint:
+                    skipped += 1
+                    continue
+                changes[key] = fingerprint
+                yield encoded
+        logger.debug('Skipped %d unchanged rows of %s' % (skipped, dataset))
@@ -6,18 +6,20 @@ from dateutil.parser import parse
 NULL = 'NULL'
 DATE_NULL = ''
 FALSY_DATES = (None, '', 'NULL')
+DATE_FORMAT = '%Y-%m-%d'
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
 BOOL_TRUE = 'yes'
 BOOL_FALSE = 'no'
 # GD doesn't support dates > 2049
 GD_MAX_YEAR = 2049
+# beginning of GD date ids
+GD_DATE_ORIGIN = datetime(1900, 1, 1)
 
 
 def get_date_id(date):
     if not date:
         return 0
-    # beginning of GD date ids
-    td = datetime(1900, 1, 1)
-    delta = date - td
+    delta = date - GD_DATE_ORIGIN
 
     return delta.days + 1
 
@@ -53,13 +55,13 @@ def format_dates(line, dates, datetimes):
 
             # date value
             if isinstance(date_value, datetime):
-                line[date_field] = date_value.strftime('%Y-%m-%d %H:%M:%S')
+                line[date_field] = date_value.strftime(DATETIME_FORMAT)
             else:
                 line[date_field] = DATE_NULL
         else:
             # date value
             if isinstance(date_value, datetime):
-                line[date_field] = date_value.strftime('%Y-%m-%d')
+                line[date_field] = date_value.strftime(DATE_FORMAT)
             else:
                 line[date_field] = DATE_NULL
 
@@ -83,6 +85,26 @@ def csv_encode(val):
     return val
 
 
+def is_sequence_row(row):
+    """
+    Tell if a row is a sequence of values (tuple, list, namedtuple,
+    sqlite3.Row or other cursor row) rather than a dict keyed by
+    column name, a mapping being a dict or having a `get` method.
+    """
+    return not isinstance(row, dict) and not hasattr(row, 'get')
+
+
+# fast paths of csv_encode, by exact type
+TYPE_ENCODERS = {
+    type(None): lambda val: NULL,
+    bool: lambda val: BOOL_TRUE if val else BOOL_FALSE,
+    unicode: lambda val: val.encode('utf-8'),
+    int: str,
+    long: str,
+    float: str,
+}
+
+
 def csv_encode_dict(dict_data):
     """
     A function to encode / format a dictionary values.
@@ -94,6 +116,164 @@ def csv_encode_dict(dict_data):
     return dict_data
 
 
+class EncodedRow(list):
+    """
+    A row already encoded by a RowEncoder (the list of its CSV values),
+    which the RowEncoder returns as is instead of encoding it again.
+    """
+
+
+class RowEncoder(object):
+    """
+    A row encoder, compiled once for a given list of columns. It
+    turns a row of data into the list of the CSV values of
+    `fieldnames`, doing the work of format_dates and csv_encode_dict
+    without walking the date lists nor building intermediate dicts.
+
+    A row is either a dict keyed by column name, or a sequence (tuple,
+    list, namedtuple, database cursor row) of the values of `columns`,
+    the fieldnames that are not computed from a date, in order (see
+    is_sequence_row). A sequence of another length raises ValueError.
+    An EncodedRow is returned as is.
+
+    Like csv.DictWriter, a dict with keys outside of `fieldnames` raises
+    ValueError, but only the keys of the first row are checked, so that
+    the other rows are encoded at full speed.
+
+    :param fieldnames:      the CSV columns, in order (see the sli manifest).
+    :param dates:           the list of date fields.
+    :param datetimes:       the list of datetime fields.
+    """
+
+    def __init__(self, fieldnames, dates, datetimes):
+        self.fieldnames = list(fieldnames)
+        self.dates = list(dates)
+        self.datetimes = list(datetimes)
+        derived = set()
+        for date_field in self.dates + self.datetimes:
+            derived.add('%s_dt' % date_field)
+        for date_field in self.datetimes:
+            derived.update(('%s_tm' % date_field, 'tm_%s_id' % date_field))
+        self.columns = [name for name in self.fieldnames if name not in derived]
+        self.encode = self.compile()
+        self.checked = False
+
+    def __call__(self, row):
+        if not self.checked:
+            self.check_fields(row)
+        return self.encode(row)
+
+    def check_fields(self, row):
+        """
+        Raise ValueError if the row is a dict with keys which are not
+        fieldnames, which would be dropped by the encoding.
+        """
+        self.checked = True
+        if is_sequence_row(row) or not hasattr(row, 'keys'):
+            return
+        fieldnames = set(self.fieldnames)
+        wrong_fields = [key for key in row.keys() if key not in fieldnames]
+        if wrong_fields:
+            raise ValueError(
+                'dict contains fields not in fieldnames: %s' % ', '.join(map(repr, wrong_fields))
+            )
+
+    def __getstate__(self):
+        # the compiled function can't be pickled, it is compiled
+        # again when the encoder is sent to another process
+        return self.fieldnames, self.dates, self.datetimes
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def get_source(self, positional=False):
+        """
+        Generate the source code of the encoding function.
+
+        :param positional:  if True, the function encodes sequences,
+                            else it encodes dicts.
+        """
+        if positional:
+            lines = [
+                'def encode_sequence(row):',
+                '    if type(row) is EncodedRow:',
+                '        return row',
+                '    if len(row) != %d:' % len(self.columns),
+                '        raise ValueError("Expected a row of %d values (%s), got %%d: %%r" %% (len(row), row))' % (
+                    len(self.columns), ', '.join(self.columns)
+                ),
+            ]
+            positions = dict((name, index) for index, name in enumerate(self.columns))
+            get_value = lambda name: 'row[%d]' % positions[name]
+            get_optional_value = get_value
+        else:
+            lines = [
+                'def encode(row):',
+                '    if not isinstance(row, dict) and not hasattr(row, "get"):',
+                '        return encode_sequence(row)',
+                '    get = row.get',
+            ]
+            get_value = lambda name: 'row[%r]' % name
+            get_optional_value = lambda name: 'get(%r, "")' % name
+
+        values = {}
+        for index, date_field in enumerate(self.dates + self.datetimes):
+            is_datetime = date_field in self.datetimes
+            date = 'd%d' % index
+            lines.extend([
+                '    %s = %s' % (date, get_value(date_field)),
+                '    if not isinstance(%s, datetime) and %s in FALSY_DATES:' % (date, date),
+                '        %s = DATE_NULL' % date,
+                '    if %s and %s.year > GD_MAX_YEAR:' % (date, date),
+                '        %s = %s.replace(year=GD_MAX_YEAR)' % (date, date),
+            ])
+            # isoformat is much faster than strftime, and gives the same
+            # result on the first 10 (date) or 19 (datetime) characters
+            values[date_field] = "%s.isoformat(' ')[:%d] if isinstance(%s, datetime) else DATE_NULL" % (
+                date, 19 if is_datetime else 10, date
+            )
+            values['%s_dt' % date_field] = 'str((%s - GD_DATE_ORIGIN).days + 1) if %s else "0"' % (
+                date, date
+            )
+            if is_datetime:
+                seconds = 's%d' % index
+                lines.append(
+                    '    %s = str(%s.hour * 3600 + %s.minute * 60 + %s.second) if %s else "0"' % (
+                        seconds, date, date, date, date
+                    )
+                )
+                values['%s_tm' % date_field] = seconds
+                values['tm_%s_id' % date_field] = seconds
+
+        encoded = []
+        for index, name in enumerate(self.fieldnames):
+            if name in values:
+                lines.append('    c%d = %s' % (index, values[name]))
+            else:
+                lines.append('    c%d = %s' % (index, get_optional_value(name)))
+                lines.append('    if type(c%d) is not str:' % index)
+                lines.append('        c%d = get_encoder(type(c%d), csv_encode)(c%d)' % (index, index, index))
+            encoded.append('c%d' % index)
+        lines.append('    return [%s]' % ', '.join(encoded))
+
+        return '\n'.join(lines)
+
+    def compile(self):
+        namespace = {
+            'datetime': datetime,
+            'EncodedRow': EncodedRow,
+            'csv_encode': csv_encode,
+            'get_encoder': TYPE_ENCODERS.get,
+            'FALSY_DATES': FALSY_DATES,
+            'DATE_NULL': DATE_NULL,
+            'GD_MAX_YEAR': GD_MAX_YEAR,
+            'GD_DATE_ORIGIN': GD_DATE_ORIGIN,
+        }
+        source = '\n\n'.join((self.get_source(positional=True), self.get_source()))
+        exec compile(source, '<RowEncoder>', 'exec') in namespace
+        return namespace['encode']
+
+
 def csv_decode(val):
     val = val.decode('utf-8')
 
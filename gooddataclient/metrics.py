@@ -0,0 +1,279 @@
+"""
+Instrumentation of the calls to the GoodData API.
+
+A hook is any object with an `on_request(info)` and/or an `on_poll(info)`
+method, registered with Connection.add_hook: on_request receives a
+RequestInfo after each HTTP request, on_poll a PollInfo once the polling
+of each task stops, whatever its outcome. Metrics is a hook aggregating these events into counters
+and histograms, exported as a dict or in the Prometheus text format.
+"""
+from bisect import bisect_left
+from collections import namedtuple
+import logging
+import re
+import threading
+from urlparse import urlparse
+
+logger = logging.getLogger("gooddataclient")
+
+RequestInfo = namedtuple('RequestInfo', (
+    'method', 'uri', 'template', 'status', 'bytes_in', 'bytes_out', 'latency'
+))
+# the outcome of a polled task is one of the POLL_* values below
+PollInfo = namedtuple('PollInfo', ('uri', 'template', 'iterations', 'duration', 'outcome'))
+
+POLL_DONE = 'done'
+POLL_TIMEOUT = 'timeout'
+POLL_CANCELLED = 'cancelled'
+# the check of the task failed, or the polling was interrupted
+POLL_ERROR = 'error'
+
+# upper bounds (in seconds) of the latency buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# upper bounds of the poll iterations buckets
+ITERATIONS_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+UNKNOWN_TEMPLATE = '{unknown}'
+# the path segment following these ones is an identifier
+NAMED_SEGMENTS = {
+    'md': '{project}', 'projects': '{project}', 'users': '{user}', 'uploads': '{dir}'
+}
+ID_SEGMENT_RE = re.compile(r'^(\d+|(?=.*\d)[0-9a-zA-Z_-]{16,})$')
+
+
+def get_uri_template(uri):
+    """
+    Get the template of an uri, without host nor query string, and
+    with its identifiers (projects, users, objects, tasks) replaced
+    by placeholders, so that the metrics of similar calls add up:
+    /gdc/md/abc.../obj/123 gives /gdc/md/{project}/obj/{id}.
+    """
+    segments = urlparse(uri).path.split('/')
+    for index in range(1, len(segments)):
+        if not segments[index]:
+            continue
+        if segments[index - 1] in NAMED_SEGMENTS:
+            segments[index] = NAMED_SEGMENTS[segments[index - 1]]
+        elif ID_SEGMENT_RE.match(segments[index]):
+            segments[index] = '{id}'
+    return '/'.join(segments)
+
+
+def call_hooks(hooks, name, info):
+    """
+    Call the method `name` of the hooks having it, the errors
+    of a hook are logged and do not break the instrumented call.
+    """
+    for hook in hooks:
+        method = getattr(hook, name, None)
+        if method is None:
+            continue
+        try:
+            method(info)
+        except Exception, err:
+            logger.debug('Hook %s failed on %s: %s' % (hook, info, err))
+
+
+class Histogram(object):
+    """
+    A histogram of observed values, by buckets of given upper bounds.
+
+    :param buckets:     the sorted upper bounds of the buckets, an
+                        extra bucket holding the bigger values.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def get_cumulative_counts(self):
+        """
+        Return the list of tuples (upper bound, number of values lower
+        or equal), the last upper bound being '+Inf'.
+        """
+        cumulative, total = [], 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+    def as_dict(self):
+        return {
+            'buckets': self.get_cumulative_counts(),
+            'sum': self.sum,
+            'count': self.count,
+        }
+
+
+class RequestStats(object):
+
+    def __init__(self, latency_buckets):
+        self.statuses = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latency = Histogram(latency_buckets)
+
+    def as_dict(self):
+        return {
+            'count': self.latency.count,
+            'statuses': dict(self.statuses),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'latency': self.latency.as_dict(),
+        }
+
+
+class PollStats(object):
+
+    def __init__(self, latency_buckets, iterations_buckets):
+        self.outcomes = {}
+        self.iterations = Histogram(iterations_buckets)
+        self.duration = Histogram(latency_buckets)
+
+    def as_dict(self):
+        return {
+            'count': self.duration.count,
+            'outcomes': dict(self.outcomes),
+            'iterations': self.iterations.as_dict(),
+            'duration': self.duration.as_dict(),
+        }
+
+
+class Metrics(object):
+    """
+    A hook aggregating the requests by method and uri template (their
+    number by status, the bytes sent and received, a latency histogram),
+    and the polled tasks by uri template (their number by outcome,
+    histograms of the number of checks and of the waiting time).
+
+    :param latency_buckets:     the upper bounds (in seconds) of the
+                                latency and polling time buckets.
+    :param iterations_buckets:  the upper bounds of the poll
+                                iterations buckets.
+    """
+
+    def __init__(self, latency_buckets=LATENCY_BUCKETS, iterations_buckets=ITERATIONS_BUCKETS):
+        self.latency_buckets = latency_buckets
+        self.iterations_buckets = iterations_buckets
+        self.lock = threading.Lock()
+        # (method, template) -> RequestStats
+        self.requests = {}
+        # template -> PollStats
+        self.polls = {}
+
+    def on_request(self, info):
+        with self.lock:
+            key = (info.method.upper(), info.template)
+            stats = self.requests.get(key)
+            if stats is None:
+                stats = self.requests[key] = RequestStats(self.latency_buckets)
+            stats.statuses[info.status] = stats.statuses.get(info.status, 0) + 1
+            stats.bytes_in += info.bytes_in
+            stats.bytes_out += info.bytes_out
+            stats.latency.observe(info.latency)
+
+    def on_poll(self, info):
+        # the tasks polled by key rather than by uri have no template
+        template = info.template or UNKNOWN_TEMPLATE
+        with self.lock:
+            stats = self.polls.get(template)
+            if stats is None:
+                stats = self.polls[template] = PollStats(
+                    self.latency_buckets, self.iterations_buckets
+                )
+            stats.outcomes[info.outcome] = stats.outcomes.get(info.outcome, 0) + 1
+            stats.iterations.observe(info.iterations)
+            stats.duration.observe(info.duration)
+
+    def reset(self):
+        with self.lock:
+            self.requests.clear()
+            self.polls.clear()
+
+    def as_dict(self):
+        """
+        Export the metrics as a dictionary:
+        {'requests': {'METHOD template': stats}, 'polls': {template: stats}}
+        """
+        with self.lock:
+            return {
+                'requests': dict(
+                    ('%s %s' % key, stats.as_dict()) for key, stats in self.requests.iteritems()
+                ),
+                'polls': dict(
+                    (template, stats.as_dict()) for template, stats in self.polls.iteritems()
+                ),
+            }
+
+    def to_prometheus(self, prefix='gooddata'):
+        """
+        Export the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def add_metric(name, kind, samples):
+            lines.append('# TYPE %s_%s %s' % (prefix, name, kind))
+            for suffix, labels, value in samples:
+                lines.append('%s_%s%s{%s} %s' % (
+                    prefix, name, suffix,
+                    ','.join('%s="%s"' % (label, escape_label(label_value))
+                             for label, label_value in labels),
+                    format_value(value)
+                ))
+
+        def histogram_samples(labels, histogram):
+            samples = [
+                ('_bucket', labels + [('le', bound)], count)
+                for bound, count in histogram.get_cumulative_counts()
+            ]
+            samples.append(('_sum', labels, histogram.sum))
+            samples.append(('_count', labels, histogram.count))
+            return samples
+
+        with self.lock:
+            requests = sorted(self.requests.iteritems())
+            polls = sorted(self.polls.iteritems())
+            add_metric('requests_total', 'counter', [
+                ('', [('method', method), ('uri', template),
+                      ('status', status if status is not None else 'error')], count)
+                for (method, template), stats in requests
+                for status, count in sorted(stats.statuses.iteritems())
+            ])
+            for name, attribute in (('received', 'bytes_in'), ('sent', 'bytes_out')):
+                add_metric('request_bytes_%s_total' % name, 'counter', [
+                    ('', [('method', method), ('uri', template)], getattr(stats, attribute))
+                    for (method, template), stats in requests
+                ])
+            add_metric('request_duration_seconds', 'histogram', [
+                sample for (method, template), stats in requests
+                for sample in histogram_samples([('method', method), ('uri', template)], stats.latency)
+            ])
+            add_metric('polls_total', 'counter', [
+                ('', [('uri', template), ('outcome', outcome)], count)
+                for template, stats in polls
+                for outcome, count in sorted(stats.outcomes.iteritems())
+            ])
+            add_metric('poll_iterations', 'histogram', [
+                sample for template, stats in polls
+                for sample in histogram_samples([('uri', template)], stats.iterations)
+            ])
+            add_metric('poll_duration_seconds', 'histogram', [
+                sample for template, stats in polls
+                for sample in histogram_samples([('uri', template)], stats.duration)
+            ])
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
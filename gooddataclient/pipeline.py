@@ -0,0 +1,171 @@
+from itertools import islice
+import logging
+from Queue import Queue, Empty, Full
+import sys
+import threading
+
+logger = logging.getLogger("gooddataclient")
+
+# marks the end of the items flowing through the pipeline
+END = object()
+# how often (in seconds) blocked stages check that the pipeline is still running
+WAKE_UP_INTERVAL = 0.1
+
+
+def iter_chunks(iterable, size):
+    """
+    Generator cutting an iterable into lists of `size` elements
+    (the last one can be smaller).
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            break
+        yield chunk
+
+
+class ListSlice(object):
+    """
+    A view of the items start:stop of a list or a tuple, which keeps
+    a reference to them instead of copying them (see iter_slices).
+    """
+
+    def __init__(self, items, start, stop):
+        self.items = items
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __iter__(self):
+        return iter(self.items[self.start:self.stop])
+
+
+def iter_slices(items, size):
+    """
+    Generator cutting a list or a tuple into ListSlices of `size`
+    items (the last one can be smaller).
+    """
+    for start in xrange(0, len(items), size):
+        yield ListSlice(items, start, min(start + size, len(items)))
+
+
+class Pipeline(object):
+    """
+    A class to run a sequence of stages concurrently: each stage runs in
+    its own thread and hands its results to the next stage through a
+    bounded queue, so that item k+1 is processed by a stage while item k
+    is processed by the next one. At most `max_in_flight` items wait
+    between two stages, which caps the memory used.
+
+    :param stages:          a list of callables, each one receiving
+                            the result of the previous stage.
+    :param max_in_flight:   the size of the queues between stages.
+    :param discard:         if not None, a callable (item, stage_index)
+                            called on the items left in the queues when
+                            the pipeline is aborted, to clean them up.
+    """
+
+    def __init__(self, stages, max_in_flight=2, discard=None):
+        self.stages = stages
+        self.max_in_flight = max_in_flight
+        self.discard = discard
+        self.stopped = threading.Event()
+        self.error = None
+
+    def put(self, queue, item):
+        while not self.stopped.is_set():
+            try:
+                queue.put(item, timeout=WAKE_UP_INTERVAL)
+                return True
+            except Full:
+                pass
+        return False
+
+    def get(self, queue):
+        while not self.stopped.is_set():
+            try:
+                return queue.get(timeout=WAKE_UP_INTERVAL)
+            except Empty:
+                pass
+        return END
+
+    def abort(self):
+        if self.error is None:
+            self.error = sys.exc_info()
+        self.stopped.set()
+
+    def run_stage(self, index, inbox, outbox):
+        stage = self.stages[index]
+        try:
+            while True:
+                item = self.get(inbox)
+                if item is END:
+                    break
+                result = stage(item)
+                if not self.put(outbox, result):
+                    self.discard_item(result, index + 1)
+                    break
+            self.put(outbox, END)
+        except Exception:
+            self.abort()
+
+    def run(self, items):
+        """
+        Push the items through the pipeline and return the
+        results of the last stage, in order. The first error
+        raised by a stage stops the pipeline and is re-raised.
+        """
+        queues = [Queue(self.max_in_flight) for _ in self.stages]
+        # the results are gathered at the end, their queue must not block
+        queues.append(Queue())
+        threads = [
+            threading.Thread(target=self.run_stage, args=(i, queues[i], queues[i + 1]))
+            for i in range(len(self.stages))
+        ]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        results = []
+        try:
+            for item in items:
+                if not self.put(queues[0], item):
+                    break
+            self.put(queues[0], END)
+            while not self.stopped.is_set():
+                item = self.get(queues[-1])
+                if item is END:
+                    break
+                results.append(item)
+        except BaseException:
+            self.abort()
+        finally:
+            self.stopped.set()
+            for thread in threads:
+                thread.join()
+
+        if self.error is not None:
+            self.discard_items(queues)
+            raise self.error[0], self.error[1], self.error[2]
+        return results
+
+    def discard_items(self, queues):
+        for index, queue in enumerate(queues[1:-1], 1):
+            while True:
+                try:
+                    item = queue.get_nowait()
+                except Empty:
+                    break
+                if item is not END:
+                    self.discard_item(item, index)
+
+    def discard_item(self, item, index):
+        if not self.discard or index >= len(self.stages):
+            return
+        try:
+            self.discard(item, index)
+        except Exception, err:
+            logger.debug('Could not discard %s: %s' % (item, err))
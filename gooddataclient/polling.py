@@ -0,0 +1,186 @@
+import logging
+import Queue
+import random
+import time
+
+from gooddataclient.exceptions import PollingTimeout, PollingCancelled
+from gooddataclient.metrics import (
+    PollInfo, call_hooks, get_uri_template,
+    POLL_DONE, POLL_TIMEOUT, POLL_CANCELLED, POLL_ERROR
+)
+
+logger = logging.getLogger("gooddataclient")
+
+
+class Poller(object):
+    """
+    A class to poll asynchronous GoodData tasks. The task is checked
+    right away, then after `interval` seconds, and the waiting time grows
+    by `backoff` up to `max_interval`, with some random `jitter` so that
+    concurrent pollers do not hit the API at the same time.
+
+    :param interval:        the initial waiting time, in seconds.
+    :param backoff:         the factor applied to the waiting time
+                            after each unsuccessful check.
+    :param max_interval:    the maximum waiting time between two checks.
+    :param jitter:          the maximum relative random variation
+                            of the waiting time (0.1 means +/- 10%).
+    :param timeout:         if not None, the overall deadline (in seconds)
+                            after which PollingTimeout is raised.
+    :param cancel:          if not None, a callable checked before each
+                            wait, the polling stops with PollingCancelled
+                            as soon as it returns True.
+    :param hooks:           a list of hooks whose on_poll method is called
+                            with a PollInfo once the polling of each task
+                            stops, done or not (see gooddataclient.metrics).
+    """
+
+    def __init__(self, interval=0.1, backoff=2, max_interval=5, jitter=0.1,
+                 timeout=None, cancel=None, hooks=None):
+        self.interval = interval
+        self.backoff = backoff
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.cancel = cancel
+        self.hooks = hooks if hooks is not None else []
+
+    def get_intervals(self):
+        """
+        Generator of the successive waiting times.
+        """
+        interval = self.interval
+        while True:
+            yield interval * (1 + random.uniform(-self.jitter, self.jitter))
+            interval = min(interval * self.backoff, self.max_interval)
+
+    def get_deadline(self):
+        return time.time() + self.timeout if self.timeout is not None else None
+
+    def check_deadline(self, deadline, uri):
+        """
+        Raise the appropriate error if the polling has to stop.
+        """
+        if self.cancel and self.cancel():
+            raise PollingCancelled('Polling of %(uri)s was cancelled', uri=uri)
+        if deadline is not None and time.time() >= deadline:
+            raise PollingTimeout(
+                'Polling of %(uri)s timed out after %(timeout)ss',
+                uri=uri, timeout=self.timeout
+            )
+
+    def notify_done(self, uri, iterations, started, outcome):
+        """
+        Report the end of the polling of a task to the hooks.
+        """
+        if self.hooks:
+            template = get_uri_template(uri) if isinstance(uri, basestring) else None
+            call_hooks(self.hooks, 'on_poll', PollInfo(
+                uri, template, iterations, time.time() - started, outcome
+            ))
+
+    def poll(self, check, uri=None):
+        """
+        Call `check` until the task is done, and return its result.
+
+        :param check:       a callable returning a tuple
+                            (is_done, result).
+        :param uri:         the polled uri, for the error messages.
+        """
+        started = time.time()
+        deadline = self.get_deadline()
+        iterations, outcome = 0, POLL_ERROR
+        try:
+            for iterations, interval in enumerate(self.get_intervals(), 1):
+                done, result = check()
+                if done:
+                    outcome = POLL_DONE
+                    return result
+                self.check_deadline(deadline, uri)
+                if deadline is not None:
+                    interval = min(interval, max(deadline - time.time(), 0))
+                logger.debug('Waiting %.2fs before polling %s' % (interval, uri))
+                time.sleep(interval)
+        except PollingTimeout:
+            outcome = POLL_TIMEOUT
+            raise
+        except PollingCancelled:
+            outcome = POLL_CANCELLED
+            raise
+        finally:
+            self.notify_done(uri, iterations, started, outcome)
+
+    def iter_poll_all(self, checks, more=None):
+        """
+        Poll several tasks from a single loop, each with its own
+        backoff, and yield the tuples (key, result) as soon as each
+        task is done. The whole polling lasts as long as the slowest
+        task, and the deadline applies to all of them.
+
+        :param checks:      a list of tuples (key, check), where check is
+                            a callable returning a tuple (is_done, result)
+                            and key identifies the task (its uri for instance).
+        :param more:        if not None, a Queue of the tuples (key, check)
+                            of the tasks to poll as soon as they are put
+                            to it, until None is put to it.
+        """
+        deadline = self.get_deadline()
+        # key -> (next check time, intervals, check, started)
+        pending = {}
+        iterations = {}
+        order = []
+
+        def add(key, check):
+            pending[key] = (0, self.get_intervals(), check, time.time())
+            iterations[key] = 0
+            order.append(key)
+
+        for key, check in checks:
+            add(key, check)
+        outcome = POLL_ERROR
+        try:
+            while pending or more is not None:
+                for key in order:
+                    if key not in pending or pending[key][0] > time.time():
+                        continue
+                    _, intervals, check, started = pending[key]
+                    done, result = check()
+                    iterations[key] += 1
+                    if done:
+                        del pending[key]
+                        self.notify_done(key, iterations[key], started, POLL_DONE)
+                        yield key, result
+                    else:
+                        pending[key] = (time.time() + intervals.next(), intervals, check, started)
+                order = [key for key in order if key in pending]
+                if not pending and more is None:
+                    break
+
+                self.check_deadline(deadline, ', '.join(str(key) for key in order))
+                wake_ups = [next_check for next_check, _, __, ___ in pending.itervalues()]
+                if deadline is not None:
+                    wake_ups.append(deadline)
+                wait = max(min(wake_ups) - time.time(), 0) if wake_ups else None
+                if more is None:
+                    time.sleep(wait)
+                    continue
+                # wait for the new tasks, until the next check is due
+                try:
+                    task = more.get(timeout=wait)
+                    while task is not None:
+                        add(*task)
+                        task = more.get_nowait()
+                    more = None
+                except Queue.Empty:
+                    pass
+        except PollingTimeout:
+            outcome = POLL_TIMEOUT
+            raise
+        except PollingCancelled:
+            outcome = POLL_CANCELLED
+            raise
+        finally:
+            # the tasks still pending when the polling stops
+            for key in order:
+                if key in pending:
+                    self.notify_done(key, iterations[key], pending[key][3], outcome)
@@ -1,10 +1,10 @@
-import time
 import logging
 
 from requests.exceptions import (
     HTTPError, ConnectionError
 )
 
+from gooddataclient.cache import TTLCache, METADATA_TTL
 from gooddataclient.exceptions import (
     ProjectNotOpenedError, UploadFailed, ProjectNotFoundError, MaqlExecutionFailed,
     get_api_msg, MaqlValidationFailed, ProjectCreationError, DMLExecutionFailed,
@@ -33,8 +33,11 @@ class Project(object):
     DML_EXEC_URI = '/gdc/md/%s/dml/manage'
     USING_URI = '/gdc/md/%s/using/%s'
 
-    def __init__(self, connection):
+    def __init__(self, connection, metadata_ttl=METADATA_TTL):
         self.connection = connection
+        # the metadata of the datasets and their columns, cleared
+        # whenever the model or the data of the project changes
+        self.metadata_cache = TTLCache(metadata_ttl)
 
     def load(self, id=None, name=None):
         self.id = id or self.get_id_by_name(name)
@@ -91,6 +94,8 @@ class Project(object):
         except TypeError:
             err_msg = 'Project does not seem to be opened: %(project_id)s'
             raise ProjectNotOpenedError(err_msg, project_id=self.id, uri=uri)
+        finally:
+            self.metadata_cache.clear()
 
     def validate_maql(self, maql):
         """
@@ -112,49 +117,99 @@ class Project(object):
             err_msg = 'MAQL queries did not validate'
             raise MaqlValidationFailed(err_msg, reponse=content)
 
-    def execute_maql(self, maql, wait_for_finish=True):
+    def execute_maql(self, maql, wait_for_finish=True, poller=None):
         self.validate_maql(maql)
 
         data = {'manage': {'maql': maql}}
-        response = self.connection.post(
-            uri=self.MAQL_EXEC_URI % self.id, data=data,
-            raise_cls=MaqlExecutionFailed
-        )
-        # It seems the API can retrieve several links
-        task_uris = [entry['link'] for entry in response.json()['entries']]
-
-        if wait_for_finish:
-            for task_uri in task_uris:
-                self.connection.poll_gd_response(task_uri, 'wTaskStatus.status', MaqlExecutionFailed, {'maql': maql})
-
-    def execute_dml(self, maql):
+        try:
+            response = self.connection.post(
+                uri=self.MAQL_EXEC_URI % self.id, data=data,
+                raise_cls=MaqlExecutionFailed
+            )
+            # It seems the API can retrieve several links
+            task_uris = [entry['link'] for entry in response.json()['entries']]
+
+            if wait_for_finish:
+                self.connection.poll_gd_responses([
+                    (task_uri, 'wTaskStatus.status', MaqlExecutionFailed, {'maql': maql})
+                    for task_uri in task_uris
+                ], poller=poller)
+        finally:
+            self.metadata_cache.clear()
+
+    def execute_dml(self, maql, poller=None):
         """
         Execute MAQL statements on the DML entrypoint of the API,
         for example deleting rows for a dataset, etc...
 
         :param maql:    the MAQL statements
+        :param poller:  the Poller used to wait for the task,
+                        defaults to the connection's one.
         """
         data = {'manage': {'maql': maql}}
 
-        response = self.connection.post(
-            uri=self.DML_EXEC_URI % self.id, data=data,
-            raise_cls=DMLExecutionFailed
-        )
+        try:
+            response = self.connection.post(
+                uri=self.DML_EXEC_URI % self.id, data=data,
+                raise_cls=DMLExecutionFailed
+            )
 
-        uri = response.json()['uri']
-        self.connection.poll_gd_response(uri, 'taskState.status', DMLExecutionFailed, {'maql': maql})
+            uri = response.json()['uri']
+            self.connection.poll_gd_response(
+                uri, 'taskState.status', DMLExecutionFailed,
+                {'maql': maql}, poller=poller
+            )
+        finally:
+            self.metadata_cache.clear()
 
-    def integrate_uploaded_data(self, dir_name, wait_for_finish=True):
+    def start_integration(self, dir_name):
+        """
+        Start the integration of data uploaded in the webdav
+        directory `dir_name`, and return the uri of the pull task.
+        """
         response = self.connection.post(
             self.PULL_URI % self.id,
             {'pullIntegration': dir_name},
             raise_cls=UploadFailed,
             dir_name=dir_name
         )
-        task_uri = response.json()['pullTask']['uri']
+        return response.json()['pullTask']['uri']
 
-        if wait_for_finish:
-            self.connection.poll_gd_response(task_uri, 'taskStatus', UploadFailed, {'dir_name': dir_name})
+    def integrate_uploaded_data(self, dir_name, wait_for_finish=True, poller=None):
+        tracer = self.connection.tracer
+        with tracer.span('integrate'):
+            task_uri = self.start_integration(dir_name)
+
+        try:
+            if wait_for_finish:
+                with tracer.span('poll'):
+                    self.connection.poll_gd_response(
+                        task_uri, 'taskStatus', UploadFailed,
+                        {'dir_name': dir_name}, poller=poller
+                    )
+        finally:
+            # the datasets metadata holds the last upload
+            self.metadata_cache.clear()
+        return task_uri
+
+    def integrate_uploaded_dirs(self, dir_names, poller=None):
+        """
+        Integrate the data of several webdav directories: all the pull
+        tasks are started, then polled together, so that the total
+        waiting time is the one of the slowest integration.
+
+        :param dir_names:   the webdav directories to integrate
+        :param poller:      the Poller used to wait for the tasks,
+                            defaults to the connection's one.
+        """
+        tasks = [
+            (self.start_integration(dir_name), 'taskStatus', UploadFailed, {'dir_name': dir_name})
+            for dir_name in dir_names
+        ]
+        try:
+            self.connection.poll_gd_responses(tasks, poller=poller)
+        finally:
+            self.metadata_cache.clear()
 
     def get_using(self, object_id):
         """
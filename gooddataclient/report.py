@@ -1,11 +1,34 @@
-import time
+import csv
+from itertools import chain
 import logging
 
-from gooddataclient.exceptions import ReportExecutionFailed, ReportExportFailed, ReportRetrievalFailed
+from gooddataclient.batch import run_batch
+from gooddataclient.exceptions import (
+    ReportExecutionFailed, ReportExportFailed, ReportRetrievalFailed, BatchExportFailed
+)
+from gooddataclient.formatter import csv_decode_dict
 
 
 logger = logging.getLogger("gooddataclient")
 
+# size of the blocks read from a streamed report export
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def iter_lines(chunks):
+    '''
+    Generator cutting blocks of text into lines, keeping
+    the line endings, as expected by csv readers.
+    '''
+    pending = ''
+    for chunk in chunks:
+        lines = (pending + chunk).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    if pending:
+        yield pending
+
 
 class Report(object):
     '''
@@ -68,37 +91,138 @@ class Report(object):
 
         self.export_download_uri = response.json()['uri']
 
-    def get_report(self):
+    def get_report(self, poller=None):
         '''
         Use this method to retrieve the report's data.
         Stores the data in report_content.
+
+        :param poller:      the Poller used to wait for the export,
+                            defaults to the connection's one.
         '''
         if self.is_ready:
             return self.report_content
 
         if not self.export_download_uri:
             self.export_report()
-        response = self.connection.get(
-            uri=self.export_download_uri,
-            raise_cls=ReportRetrievalFailed,
-            report_id=self.id
-        )
-        self.report_content = response.text
 
-        if not self.is_ready:
-            time.sleep(0.5)
-            self.get_report()
+        def check():
+            response = self.connection.get(
+                uri=self.export_download_uri,
+                raise_cls=ReportRetrievalFailed,
+                report_id=self.id
+            )
+            self.report_content = response.text
+            return self.is_ready, self.report_content
+
+        return (poller or self.connection.poller).poll(check, self.export_download_uri)
 
-    def save_report(self, file_path):
+    def save_report(self, file_path, poller=None, stream=False):
         '''
         Use this method to save the report's data
         in a given file.
+
+        :param stream:      if True, the export is streamed to the
+                            file, see stream_report.
         '''
+        if stream:
+            return self.stream_report(file_path, poller)
         if not self.is_ready:
-            self.get_report()
+            self.get_report(poller)
         with open(file_path, 'w') as f:
             f.write(self.report_content)
 
+    def iter_report_chunks(self, poller=None, chunk_size=EXPORT_CHUNK_SIZE):
+        '''
+        Wait for the report's export, and return an iterator over
+        the blocks of its CSV (utf-8 encoded), read from GD as the
+        iterator is consumed, so that the export is never fully
+        loaded into memory. Unlike get_report, the content is not
+        kept in report_content.
+
+        :param poller:      the Poller used to wait for the export,
+                            defaults to the connection's one.
+        :param chunk_size:  the size (in bytes) of the blocks.
+        '''
+        if not self.export_download_uri:
+            self.export_report()
+        return (poller or self.connection.poller).poll(
+            self.get_export_check(chunk_size), self.export_download_uri
+        )
+
+    def get_export_check(self, chunk_size=EXPORT_CHUNK_SIZE):
+        '''
+        Build the check function polling the report's export: it
+        returns (True, iterator over the CSV blocks) once the export
+        is done, else (False, None).
+        '''
+        def check():
+            response = self.connection.get(
+                uri=self.export_download_uri,
+                raise_cls=ReportRetrievalFailed,
+                report_id=self.id,
+                stream=True
+            )
+            chunks = response.iter_content(chunk_size)
+            first_chunk = next(chunks, '')
+            # see is_ready: GD replies with the export uri until it is done
+            if first_chunk[:1] == '{':
+                # read the small json body, to release the connection
+                for _ in chunks:
+                    pass
+                return False, None
+            return True, chain([first_chunk], chunks)
+
+        return check
+
+    def stream_report(self, output, poller=None, chunk_size=EXPORT_CHUNK_SIZE):
+        '''
+        Write the report's CSV to a file as it is downloaded,
+        in blocks of chunk_size bytes, and return its size.
+
+        :param output:      a file path, or a file-like object.
+        :param poller:      the Poller used to wait for the export,
+                            defaults to the connection's one.
+        :param chunk_size:  the size (in bytes) of the blocks.
+        '''
+        return self.stream_chunks(self.iter_report_chunks(poller, chunk_size), output)
+
+    def stream_chunks(self, chunks, output):
+        '''
+        Write blocks of the report's CSV to a file, and return its size.
+
+        :param chunks:      an iterable of blocks, see iter_report_chunks.
+        :param output:      a file path, or a file-like object.
+        '''
+        if isinstance(output, basestring):
+            with open(output, 'wb') as f:
+                return self._write_chunks(chunks, f)
+        return self._write_chunks(chunks, output)
+
+    def iter_rows(self, typed=False, poller=None, chunk_size=EXPORT_CHUNK_SIZE):
+        '''
+        Generator of the rows of the report's CSV, as dicts keyed by
+        the header's columns, parsed while the export is downloaded
+        (see iter_report_chunks), so that memory stays flat.
+
+        :param typed:       if True, the values are decoded with
+                            csv_decode (None, booleans, numbers, dates,
+                            unicode), else they are utf-8 strings.
+        :param poller:      the Poller used to wait for the export,
+                            defaults to the connection's one.
+        :param chunk_size:  the size (in bytes) of the downloaded blocks.
+        '''
+        reader = csv.DictReader(iter_lines(self.iter_report_chunks(poller, chunk_size)))
+        for row in reader:
+            yield csv_decode_dict(row) if typed else row
+
+    def _write_chunks(self, chunks, output):
+        size = 0
+        for chunk in chunks:
+            output.write(chunk)
+            size += len(chunk)
+        logger.debug('Wrote %d bytes of report %s' % (size, self.id))
+        return size
+
     @property
     def is_ready(self):
         '''
@@ -112,3 +236,47 @@ class Report(object):
         '''
         return self.report_content is not None and \
             (not self.report_content or self.report_content[0] != '{')
+
+
+def export_reports(exports, workers=4, poller=None, chunk_size=EXPORT_CHUNK_SIZE):
+    '''
+    Export several reports concurrently, each one to its own file. The
+    reports are executed and exported by a pool of `workers` threads,
+    each export is polled from a single loop as soon as it is started,
+    and streamed to its file by the pool as soon as it is ready. At most
+    `workers` requests run at the same time (see run_batch).
+
+    :param exports:     a list of tuples (report, output), where output
+                        is a file path or a file-like object.
+    :param workers:     the maximum number of concurrent requests.
+    :param poller:      the Poller used to wait for the exports,
+                        defaults to the connection's one.
+    :param chunk_size:  the size (in bytes) of the downloaded blocks.
+
+    Returns the list of the sizes of the exports, in order. Raises
+    BatchExportFailed with the errors by index if any export failed,
+    the other exports being written anyway.
+    '''
+    if not exports:
+        return []
+
+    def start((report, _)):
+        if not report.export_download_uri:
+            report.export_report()
+
+    def get_check((report, _), started):
+        return report.get_export_check(chunk_size)
+
+    def finish((report, output), chunks):
+        return report.stream_chunks(chunks, output)
+
+    sizes, errors = run_batch(
+        exports, start, get_check, finish,
+        poller or exports[0][0].connection.poller, workers
+    )
+    if errors:
+        raise BatchExportFailed(
+            'Failed to export %(failed)s', errors=errors,
+            failed=', '.join(str(exports[index][0].id) for index in sorted(errors))
+        )
+    return sizes
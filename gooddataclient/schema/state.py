@@ -1,3 +1,8 @@
+import logging
+from multiprocessing.pool import ThreadPool
+
+from requests.exceptions import HTTPError
+
 from gooddataclient.columns import Reference, ConnectionPoint
 from gooddataclient.exceptions import DataSetNotFoundError
 from gooddataclient.schema.utils import (
@@ -6,33 +11,131 @@ from gooddataclient.schema.utils import (
 )
 from gooddataclient.text import to_identifier, to_title
 
+logger = logging.getLogger("gooddataclient")
+
 
 class State(object):
 
     SLI_URI = '/gdc/md/%s/ldm/singleloadinterface/dataset.%s/manifest'
     USING_URI = '/gdc/md/%s/using/%s'
     DATASETS_URI = '/gdc/md/%s/data/sets'
+    OBJECTS_GET_URI = '/gdc/md/%s/objects/get'
+    # number of metadata objects fetched concurrently
+    FETCH_WORKERS = 8
+    # maximum number of objects fetched by a bulk request
+    OBJECTS_GET_LIMIT = 50
 
     def __init__(self, project):
         self.project = project
         self.connection = project.connection if project else None
 
+    def get_cached(self, key, compute):
+        """
+        Get a value from the project metadata cache,
+        computing it with `compute` if needed.
+        """
+        if self.project is None:
+            return compute()
+        return self.project.metadata_cache.get_or_set(key, compute)
+
+    def get_object_json(self, uri):
+        """
+        Retrieve the json of a metadata object, given its uri.
+        """
+        return self.get_cached(('object', uri), lambda: self.connection.get(uri=uri).json())
+
+    def get_objects_json(self, uris):
+        """
+        Retrieve the json of several metadata objects, as a dictionary
+        uri -> json. The objects which are not cached are fetched by bulk
+        requests of OBJECTS_GET_LIMIT objects, and the ones missing from
+        the bulk answers are fetched one by one.
+        """
+        cache = self.project.metadata_cache if self.project is not None else None
+        generation = cache.generation if cache else None
+        objects, missing, seen = {}, [], set()
+        for uri in uris:
+            if uri in seen:
+                continue
+            seen.add(uri)
+            json = cache.get(('object', uri)) if cache else None
+            if json is None:
+                missing.append(uri)
+            else:
+                objects[uri] = json
+
+        chunks = [
+            missing[start:start + self.OBJECTS_GET_LIMIT]
+            for start in range(0, len(missing), self.OBJECTS_GET_LIMIT)
+        ]
+        for found in self.map_concurrently(self.get_objects_bulk, chunks):
+            for uri, json in found.iteritems():
+                if cache:
+                    cache.set(('object', uri), json, generation)
+                objects[uri] = json
+
+        leftovers = [uri for uri in missing if uri not in objects]
+        objects.update(zip(leftovers, self.map_concurrently(self.get_object_json, leftovers)))
+        return objects
+
+    def get_objects_bulk(self, uris):
+        """
+        Fetch several metadata objects in one request, and return a
+        dictionary uri -> json of the objects found, empty if the bulk
+        request failed.
+        """
+        try:
+            response = self.connection.post(
+                uri=self.OBJECTS_GET_URI % self.project.id,
+                data={'get': {'items': uris}}
+            )
+            items = response.json()['objects']['items']
+            return dict((item.values()[0]['meta']['uri'], item) for item in items)
+        except (HTTPError, ValueError, KeyError, IndexError), err:
+            logger.debug('Bulk fetch of %d objects failed: %s' % (len(uris), err))
+            return {}
+
+    def map_concurrently(self, function, items):
+        """
+        Call `function` on the items in a pool of FETCH_WORKERS threads,
+        and return the results in the order of the items. The first
+        error raised by a call is re-raised.
+        """
+        items = list(items)
+        workers = min(self.FETCH_WORKERS, len(items))
+        if workers < 2:
+            return map(function, items)
+        pool = ThreadPool(workers)
+        try:
+            return pool.map(function, items)
+        finally:
+            pool.close()
+            pool.join()
+
     def get_datasets_metadata(self):
         """
         Retrieve the metadata for every dataset.
         """
         return self.connection.get(uri=self.DATASETS_URI % self.project.id)
 
+    def get_datasets(self):
+        """
+        Retrieve the list of the datasets metadata, cached.
+        """
+        def get_datasets():
+            try:
+                return self.get_datasets_metadata().json()['dataSetsInfo']['sets']
+            except KeyError:
+                return []
+        return self.get_cached(('datasets',), get_datasets)
+
     def get_metadata(self, name=None):
         """
         Retrieve the metadata for a given dataset.
 
         :param name:      the dataset name
         """
-        try:
-            datasets = self.get_datasets_metadata().json()['dataSetsInfo']['sets']
-        except KeyError:
-            datasets = []
+        datasets = self.get_datasets()
 
         identifier = 'dataset.%s' % to_identifier(name) if name else self.identifier
         for dataset in datasets:
@@ -50,8 +153,7 @@ class State(object):
         """
         schema_name = schema_name or self.schema_name
         dataset_json = self.get_metadata(schema_name)
-        response = self.connection.get(uri=dataset_json['meta']['uri'])
-        content_json = response.json()['dataSet']['content']
+        content_json = self.get_object_json(dataset_json['meta']['uri'])['dataSet']['content']
 
         return content_json
 
@@ -60,8 +162,9 @@ class State(object):
         A function to retrieve the details of a column,
         given its uri.
         """
-        column_json = self.connection.get(uri=uri).json()
+        return self.get_column_content(self.get_object_json(uri))
 
+    def get_column_content(self, column_json):
         try:
             return column_json['dataLoadingColumn']
         except KeyError:
@@ -70,6 +173,28 @@ class State(object):
             except KeyError:
                 return column_json['fact']
 
+    def get_column_details(self, uris):
+        """
+        Retrieve the details of several columns at once (see
+        get_objects_json), in the order of their uris.
+        """
+        objects = self.get_objects_json(uris)
+        return [self.get_column_content(objects[uri]) for uri in uris]
+
+    def get_column_details_and_pks(self, uris):
+        """
+        Retrieve the details of several columns and their pk identifiers
+        at once, as a list of tuples (column_json, pk_identifier) in the
+        order of the uris.
+        """
+        details = self.get_column_details(uris)
+        pk_uris = [self.get_column_pk_uri(column_json) for column_json in details]
+        pks = self.get_objects_json([pk_uri for pk_uri in pk_uris if pk_uri])
+        return [
+            (column_json, pks[pk_uri]['column']['meta']['identifier'] if pk_uri else None)
+            for column_json, pk_uri in zip(details, pk_uris)
+        ]
+
     def get_dlc_info(self, column_uris, sli_manifest, schema_name=None):
         """
         A function to build the dlc_info dictionary.
@@ -81,8 +206,7 @@ class State(object):
         identifier = to_identifier(schema_name) or self.identifier
         dlc_info = []
         # dataLoadingColumns
-        for column_uri in column_uris:
-            column_json = self.get_column_detail(column_uri)
+        for column_json in self.get_column_details(column_uris):
             info = retrieve_dlc_info(self.identifier, column_json, sli_manifest)
             if info:
                 dlc_info.append(info)
@@ -100,15 +224,20 @@ class State(object):
         required to check that an attribute is a connection point
         or not.
         """
-        try:
-            pk_uri = column_json['content']['pk'][0]['data']
-        except KeyError:
+        pk_uri = self.get_column_pk_uri(column_json)
+        if not pk_uri:
             return None
 
-        pk_json = self.connection.get(uri=pk_uri).json()
+        pk_json = self.get_object_json(pk_uri)
 
         return pk_json['column']['meta']['identifier']
 
+    def get_column_pk_uri(self, column_json):
+        try:
+            return column_json['content']['pk'][0]['data']
+        except KeyError:
+            return None
+
     def get_connection_point_json(self, schema_name=None):
         """
         A function to retrieve API information on a dataset
@@ -120,9 +249,7 @@ class State(object):
         schema_name = schema_name or self.identifier
         attr_uris = self.get_column_uris(schema_name)['attributes']
 
-        for uri in attr_uris:
-            col_json = self.get_column_detail(uri)
-            pk_identifier = self.get_column_pk_identifier(col_json)
+        for col_json, pk_identifier in self.get_column_details_and_pks(attr_uris):
             if attr_is_cp(pk_identifier, schema_name):
                 return col_json
         return {}
@@ -171,9 +298,8 @@ class State(object):
 
         # attributes, facts, dates, labels, hyperlinks
         for category in categories:
-            for column_uri in column_uris.get(category, []):
-                column_json = self.get_column_detail(column_uri)
-                pk_identifier = self.get_column_pk_identifier(column_json)
+            columns = self.get_column_details_and_pks(column_uris.get(category, []))
+            for column_json, pk_identifier in columns:
                 remote_columns.extend(
                     retrieve_column_tuples(column_json, category, pk_identifier, dlc_info)
                 )
@@ -238,8 +364,7 @@ class State(object):
             'suffix': suffix,
         }
 
-        for col_uri in col_uris:
-            col_json = self.get_column_detail(col_uri)
+        for col_json in self.get_column_details(col_uris):
             if col_json['meta']['identifier'] == col_identifier:
                 if (not title or (title and col_json['meta']['title'] == title)):
                     return True
@@ -261,8 +386,7 @@ class State(object):
             'label_name': label_name,
         }
 
-        for col_uri in col_uris['attributes'] + col_uris['facts']:
-            col_json = self.get_column_detail(col_uri)
+        for col_json in self.get_column_details(col_uris['attributes'] + col_uris['facts']):
             for display in col_json['content'].get('displayForms', []):
                 if re.match(label_identifier_re, display['meta']['identifier']):
                     if (not title or (title and display['meta']['title'] == title)):
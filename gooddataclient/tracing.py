@@ -0,0 +1,226 @@
+"""
+Tracing of the phases of the uploads.
+
+The phases of Dataset.upload (metadata check, dataset creation, data
+extraction, csv encoding, zipping, webdav MKCOL and PUT, integration,
+polling, webdav cleanup) are run in spans of the connection's tracer:
+
+    connection = Connection(username, password, tracer=RecordingTracer())
+
+A span records its start and end times, its parent span (the span
+running in the same thread when it started, see Tracer.activate for
+the other threads), the error which ended it if any, and attributes
+such as the number of rows or bytes processed.
+A tracer is notified of each finished span by its emit method,
+NullTracer (the default) does not even time them.
+"""
+from contextlib import contextmanager
+import logging
+import threading
+import time
+
+logger = logging.getLogger("gooddataclient")
+
+
+class Span(object):
+    """
+    A traced phase, to be used as a context manager.
+
+    :param tracer:      the Tracer notified when the span ends.
+    :param name:        the name of the phase.
+    :param attributes:  the initial attributes of the span.
+    """
+
+    recording = True
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.parent = None
+        self.start = None
+        self.end = None
+        self.error = None
+
+    @property
+    def duration(self):
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.parent = self.tracer.get_current_span()
+        self.tracer.push_span(self)
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end = time.time()
+        if exc_value is not None:
+            self.error = exc_value
+        self.tracer.pop_span(self)
+        try:
+            self.tracer.emit(self)
+        except Exception, err:
+            logger.debug('Tracer %s failed on span %s: %s' % (self.tracer, self.name, err))
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'parent': self.parent.name if self.parent is not None else None,
+            'start': self.start,
+            'end': self.end,
+            'duration': self.duration,
+            'error': repr(self.error) if self.error is not None else None,
+            'attributes': dict(self.attributes),
+        }
+
+    def __repr__(self):
+        return '<Span %s %s>' % (self.name, self.attributes)
+
+
+class NullSpan(object):
+    """
+    The span of NullTracer, which records nothing.
+    """
+
+    recording = False
+    name = None
+    parent = None
+    duration = None
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer(object):
+    """
+    The base class of the tracers: subclasses override emit,
+    called with each span once it has ended.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def span(self, name, **attributes):
+        """
+        Return a new span, to be used as a context manager:
+
+            with tracer.span('put', bytes=size) as span:
+                ...
+                span.set(status='done')
+        """
+        return Span(self, name, attributes)
+
+    def get_current_span(self):
+        stack = getattr(self.local, 'stack', None)
+        return stack[-1] if stack else None
+
+    def push_span(self, span):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        self.local.stack.append(span)
+
+    def pop_span(self, span):
+        if self.local.stack and self.local.stack[-1] is span:
+            self.local.stack.pop()
+
+    @contextmanager
+    def activate(self, span):
+        """
+        Make `span` the current span of this thread while the block runs,
+        so that the spans started in another thread on behalf of `span`
+        are its children:
+
+            parent = tracer.get_current_span()
+            ...
+            # in a worker thread
+            with tracer.activate(parent):
+                ...
+        """
+        self.push_span(span)
+        try:
+            yield span
+        finally:
+            self.pop_span(span)
+
+    def emit(self, span):
+        pass
+
+
+class NullTracer(Tracer):
+    """
+    The default tracer, which does not time the phases.
+    """
+
+    def span(self, name, **attributes):
+        return NULL_SPAN
+
+
+NULL_TRACER = NullTracer()
+
+
+def count_rows(rows, span, attribute='rows'):
+    """
+    Generator of the rows, setting their number as
+    an attribute of the span once they are consumed.
+    """
+    count = 0
+    for row in rows:
+        count += 1
+        yield row
+    span.set(**{attribute: count})
+
+
+class RecordingTracer(Tracer):
+    """
+    A tracer keeping the finished spans in its `spans` list.
+    """
+
+    def __init__(self):
+        super(RecordingTracer, self).__init__()
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def emit(self, span):
+        with self.lock:
+            self.spans.append(span)
+
+    def get_spans(self, name):
+        with self.lock:
+            return [span for span in self.spans if span.name == name]
+
+    def clear(self):
+        with self.lock:
+            del self.spans[:]
+
+
+class LoggingTracer(Tracer):
+    """
+    A tracer logging each finished span.
+
+    :param level:   the logging level of the messages.
+    """
+
+    def __init__(self, level=logging.INFO):
+        super(LoggingTracer, self).__init__()
+        self.level = level
+
+    def emit(self, span):
+        logger.log(self.level, '%s%s took %.3fs %s%s' % (
+            span.parent.name + '.' if span.parent is not None else '',
+            span.name, span.duration, span.attributes,
+            ' (failed: %s)' % span.error if span.error is not None else ''
+        ))
@@ -0,0 +1,82 @@
+import cPickle as pickle
+import logging
+import sqlite3
+import threading
+
+from gooddataclient.formatter import FALSY_DATES, is_sequence_row
+
+logger = logging.getLogger("gooddataclient")
+
+
+class Watermarks(object):
+    """
+    A local store of the high-watermarks of the datasets, the highest
+    value of a column (a date, a monotonic id) uploaded so far, kept
+    in a sqlite file. It can share its file with RowFingerprints.
+
+    :param path:    the path of the sqlite file, created if needed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS watermarks ('
+                'dataset TEXT PRIMARY KEY, value BLOB)'
+            )
+
+    def close(self):
+        self.db.close()
+
+    def get(self, dataset):
+        """
+        Return the watermark of the dataset, None if there is none yet.
+        """
+        with self.lock:
+            row = self.db.execute(
+                'SELECT value FROM watermarks WHERE dataset = ?', (dataset,)
+            ).fetchone()
+        return pickle.loads(str(row[0])) if row else None
+
+    def set(self, dataset, value):
+        with self.lock, self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO watermarks (dataset, value) VALUES (?, ?)',
+                (dataset, sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+            )
+        logger.debug('Watermark of %s set to %s' % (dataset, value))
+
+    def clear(self, dataset):
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM watermarks WHERE dataset = ?', (dataset,))
+
+
+class HighWatermark(object):
+    """
+    The highest value of a column over the rows going through `track`,
+    the empty values (None, '', 'NULL') being ignored.
+
+    :param column:      the name of the column.
+    :param columns:     the columns of the rows given as sequences.
+    :param value:       the initial watermark.
+    """
+
+    def __init__(self, column, columns, value=None):
+        self.column = column
+        self.index = list(columns).index(column)
+        self.value = value
+
+    def update(self, value):
+        if value not in FALSY_DATES and (self.value is None or value > self.value):
+            self.value = value
+
+    def track(self, rows):
+        """
+        Generator of the rows, updating the watermark on the way.
+        """
+        column, index = self.column, self.index
+        for row in rows:
+            self.update(row[index] if is_sequence_row(row) else row.get(column))
+            yield row
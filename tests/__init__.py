@@ -1,6 +1,18 @@
 from test_text import *
+from test_fake_server import *
 from test_schema import *
 from test_archiver import *
+from test_asynchronous import *
+from test_cache import *
+from test_columnar import *
+from test_fingerprints import *
+from test_watermarks import *
+from test_bulk import *
+from test_batch import *
+from test_pipeline import *
+from test_metrics import *
+from test_polling import *
+from test_tracing import *
 from test_connection import *
 from test_project import *
 from test_dataset import *
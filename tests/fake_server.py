@@ -0,0 +1,445 @@
+"""
+An offline stand-in for the GoodData API and webdav, run in a thread,
+so that the client can be tested and benchmarked without credentials
+nor network:
+
+    server = FakeGoodData(latency=0.01, task_duration=0.1).start()
+    connection = Connection('user', 'password', host=server.url, webdav_host=server.url)
+    project = Project(connection).load(id=server.add_project('test'))
+    ...
+    server.stop()
+
+It implements the endpoints used by the client: login and token,
+projects, /gdc/md datasets and objects, MAQL validation and execution,
+DML, webdav MKCOL/PUT/DELETE and pull integration, report execution
+and export, dashboard execution contexts and client exports.
+
+Every response is delayed by `latency` seconds, and the asynchronous
+tasks (MAQL, DML, integrations, exports) are done `task_duration`
+seconds after they were started.
+"""
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from cStringIO import StringIO
+import csv
+import itertools
+import re
+import socket
+from SocketServer import ThreadingMixIn
+import threading
+import time
+import uuid
+from zipfile import ZipFile
+
+import simplejson as json
+
+from gooddataclient.archiver import CSV_DATA_FILENAME, DLI_MANIFEST_FILENAME, DEFAULT_ARCHIVE_NAME
+
+
+REPORT_CSV = 'Department,Salary\r\nd1,1000\r\nd2,2000\r\n'
+DASHBOARD_PDF = '%PDF-1.4 fake dashboard\n%%EOF\n'
+
+DATASET_MAQL_RE = re.compile(r'CREATE DATASET \{dataset\.([^}]+)\}')
+DATE_MAQL_RE = re.compile(r'INCLUDE TEMPLATE "URN:GOODDATA:DATE" MODIFY \(IDENTIFIER "([^"]+)"')
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        HTTPServer.__init__(self, *args, **kwargs)
+        # the kept alive connections, closed by close_connections
+        self.connections = set()
+        self.closing = False
+
+    def process_request(self, request, client_address):
+        self.connections.add(request)
+        ThreadingMixIn.process_request(self, request, client_address)
+
+    def shutdown_request(self, request):
+        self.connections.discard(request)
+        HTTPServer.shutdown_request(self, request)
+
+    def handle_error(self, request, client_address):
+        # the connections closed by close_connections fail to be read
+        if not self.closing:
+            HTTPServer.handle_error(self, request, client_address)
+
+    def close_connections(self):
+        self.closing = True
+        for request in list(self.connections):
+            try:
+                request.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+        # wait for the handling threads to end
+        deadline = time.time() + 1
+        while self.connections and time.time() < deadline:
+            time.sleep(0.001)
+
+
+class FakeRequestHandler(BaseHTTPRequestHandler):
+
+    # keep the connections alive, as the client pools them
+    protocol_version = 'HTTP/1.1'
+    # send each response in one write, flushed once handled
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_request(self):
+        status, body, headers = self.server.fake.handle(
+            self.command, self.path, self.read_body()
+        )
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_MKCOL = do_request
+
+    def read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            body = StringIO()
+            while True:
+                size = int(self.rfile.readline().split(';')[0], 16)
+                if not size:
+                    self.rfile.readline()
+                    return body.getvalue()
+                body.write(self.rfile.read(size))
+                self.rfile.readline()
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else ''
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeGoodData(object):
+    """
+    The state of the fake server: its projects, their datasets and
+    objects, the webdav uploads and the asynchronous tasks.
+
+    :param latency:         the delay (in seconds) of every response.
+    :param task_duration:   the time (in seconds) after which the
+                            asynchronous tasks are done.
+    :param report_csv:      the content of the report exports.
+    :param dashboard_pdf:   the content of the dashboard exports.
+    """
+
+    def __init__(self, latency=0, task_duration=0, report_csv=REPORT_CSV,
+                 dashboard_pdf=DASHBOARD_PDF):
+        self.latency = latency
+        self.task_duration = task_duration
+        self.report_csv = report_csv
+        self.dashboard_pdf = dashboard_pdf
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        # project id -> {'title': name, 'datasets': {identifier: object uri}}
+        self.projects = {}
+        # object uri -> json
+        self.objects = {}
+        # the uris requested by each bulk get of objects, which
+        # answer 404 if bulk_get is False
+        self.bulk_gets = []
+        self.bulk_get = True
+        # webdav directory -> {file name: content}
+        self.uploads = {}
+        # dataset identifier -> list of the uploaded rows
+        self.rows = {}
+        # report definition uri -> csv of its exports, report_csv if missing
+        self.reports = {}
+        # the report definition uris whose exports fail, and the
+        # strings failing the dashboard exports whose url contains them
+        self.failing = set()
+        # export uri -> content of the export once done
+        self.exports = {}
+        # the data of the created execution contexts
+        self.execution_contexts = []
+        # the urls of the dashboard exports
+        self.client_exports = []
+        # task uri -> (done time, status if failed)
+        self.tasks = {}
+        # list of (method, path) of the handled requests
+        self.requests = []
+        self.routes = [
+            ('POST', r'/gdc/account/login$', self.login),
+            ('GET', r'/gdc/account/token$', self.token),
+            ('GET', r'/gdc/md/?$', self.get_about),
+            ('POST', r'/gdc/projects$', self.create_project),
+            ('DELETE', r'/gdc/projects/(\w+)$', self.delete_project),
+            ('GET', r'/gdc/md/(\w+)/data/sets$', self.get_datasets),
+            ('GET', r'(/gdc/md/\w+/obj/\d+)$', self.get_object),
+            ('DELETE', r'(/gdc/md/(\w+)/obj/\d+)$', self.delete_object),
+            ('POST', r'/gdc/md/\w+/objects/get$', self.get_objects),
+            ('POST', r'/gdc/md/(\w+)/maqlvalidator$', self.validate_maql),
+            ('POST', r'/gdc/md/(\w+)/ldm/manage2$', self.execute_maql),
+            ('GET', r'(/gdc/md/\w+/tasks/\d+/status)$', self.get_maql_task),
+            ('POST', r'/gdc/md/(\w+)/dml/manage$', self.execute_dml),
+            ('GET', r'(/gdc/md/\w+/tasks/\d+/dml)$', self.get_dml_task),
+            ('POST', r'/gdc/md/(\w+)/etl/pull$', self.pull),
+            ('GET', r'(/gdc/md/\w+/etl/task/\d+)$', self.get_pull_task),
+            ('MKCOL', r'/uploads/([^/]+)/$', self.mkcol),
+            ('PUT', r'/uploads/([^/]+)/([^/]+)$', self.put),
+            ('DELETE', r'/uploads/([^/]+)/$', self.delete_upload),
+            ('POST', r'/gdc/xtab2/executor3$', self.execute_report),
+            ('POST', r'/gdc/exporter/executor$', self.export_report),
+            ('GET', r'(/gdc/exporter/result/\d+)$', self.get_report_export),
+            ('POST', r'/gdc/projects/(\w+)/users/(\w+)/executioncontexts$',
+             self.create_execution_context),
+            ('POST', r'/gdc/projects/(\w+)/clientexport$', self.export_dashboard),
+            ('GET', r'(/gdc/exporter/clientexport/\d+)$', self.get_dashboard_export),
+        ]
+        self.server = None
+
+    def start(self, port=0):
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), FakeRequestHandler)
+        self.server.fake = self
+        # a short poll interval, so that stop returns quickly
+        thread = threading.Thread(target=self.server.serve_forever, args=(0.01,))
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.close_connections()
+        self.server.server_close()
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % self.server.server_address
+
+    def handle(self, method, path, body):
+        """
+        Route a request, and return the tuple (status, body, headers).
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        path = path.split('?', 1)[0]
+        with self.lock:
+            self.requests.append((method, path))
+            for route_method, pattern, handler in self.routes:
+                match = re.match(pattern, path)
+                if route_method == method and match:
+                    data = json.loads(body) if body and method == 'POST' else body
+                    try:
+                        response = handler(data, *match.groups())
+                    except KeyError, err:
+                        response = 400, self.error('Invalid request: %s' % err)
+                    break
+            else:
+                response = 404, self.error('Not found: %s %s' % (method, path))
+        status, content = response[:2]
+        headers = list(response[2]) if len(response) > 2 else []
+        if not isinstance(content, str):
+            content = json.dumps(content)
+            headers.append(('Content-Type', 'application/json'))
+        return status, content, headers
+
+    def error(self, message):
+        return {'error': {'message': message, 'parameters': []}}
+
+    def add_project(self, title, id=None):
+        """
+        Create a project, and return its id.
+        """
+        id = id or uuid.uuid4().hex
+        self.projects[id] = {'title': title, 'datasets': {}}
+        return id
+
+    def add_object(self, project_id, category, content=None, identifier=None):
+        """
+        Create a metadata object, and return its uri.
+        """
+        uri = '/gdc/md/%s/obj/%d' % (project_id, next(self.ids))
+        meta = {'uri': uri}
+        if identifier:
+            meta['identifier'] = identifier
+        self.objects[uri] = {category: {'meta': meta, 'content': content or {}}}
+        return uri
+
+    def add_dataset(self, project_id, identifier, title=None):
+        uri = '/gdc/md/%s/obj/%d' % (project_id, next(self.ids))
+        self.projects[project_id]['datasets'][identifier] = uri
+        self.objects[uri] = {'dataSet': {
+            'meta': {'identifier': identifier, 'uri': uri, 'title': title or identifier},
+            'content': {'attributes': [], 'facts': [], 'dataLoadingColumns': []},
+        }}
+        self.rows.setdefault(identifier, [])
+        return uri
+
+    def start_task(self, uri_format, failed=None):
+        uri = uri_format % next(self.ids)
+        self.tasks[uri] = (time.time() + self.task_duration, failed)
+        return uri
+
+    def get_task_status(self, uri):
+        """
+        Return RUNNING, OK or the failure status of a task.
+        """
+        done_time, failed = self.tasks[uri]
+        if time.time() < done_time:
+            return 'RUNNING'
+        return failed or 'OK'
+
+    def login(self, data):
+        return 200, {'userLogin': {'profile': '/gdc/account/profile/fake'}}, [
+            ('Set-Cookie', 'GDCAuthSST=fake; Path=/gdc')
+        ]
+
+    def token(self, data):
+        return 200, {'userToken': {'token': 'fake'}}
+
+    def get_about(self, data):
+        return 200, {'about': {'links': [
+            {'title': project['title'], 'identifier': id, 'link': '/gdc/md/%s' % id}
+            for id, project in self.projects.iteritems()
+        ]}}
+
+    def create_project(self, data):
+        id = self.add_project(data['project']['meta']['title'])
+        return 201, {'uri': '/gdc/projects/%s' % id}
+
+    def delete_project(self, data, id):
+        if self.projects.pop(id, None) is None:
+            return 404, self.error('Project %s not found' % id)
+        return 204, ''
+
+    def get_datasets(self, data, project_id):
+        if project_id not in self.projects:
+            return 404, self.error('Project %s not found' % project_id)
+        sets = []
+        for identifier, uri in sorted(self.projects[project_id]['datasets'].iteritems()):
+            meta = dict(self.objects[uri]['dataSet']['meta'], category='dataSet')
+            sets.append({'meta': meta, 'dataUploads': uri + '/uploads'})
+        return 200, {'dataSetsInfo': {'sets': sets}}
+
+    def get_object(self, data, uri):
+        if uri not in self.objects:
+            return 404, self.error('Object %s not found' % uri)
+        return 200, self.objects[uri]
+
+    def delete_object(self, data, uri, project_id):
+        if uri not in self.objects:
+            return 404, self.error('Object %s not found' % uri)
+        identifier = self.objects.pop(uri).values()[0]['meta']['identifier']
+        self.projects[project_id]['datasets'].pop(identifier, None)
+        return 204, ''
+
+    def get_objects(self, data):
+        if not self.bulk_get:
+            return 404, self.error('Not found')
+        self.bulk_gets.append(data['get']['items'])
+        return 200, {'objects': {'items': [
+            self.objects[uri] for uri in data['get']['items'] if uri in self.objects
+        ]}}
+
+    def validate_maql(self, data, project_id):
+        return 200, {'maqlOK': {}}
+
+    def execute_maql(self, data, project_id):
+        maql = data['manage']['maql']
+        for name in DATASET_MAQL_RE.findall(maql):
+            if 'dataset.%s' % name not in self.projects[project_id]['datasets']:
+                self.add_dataset(project_id, 'dataset.%s' % name)
+        for name in DATE_MAQL_RE.findall(maql):
+            self.add_dataset(project_id, '%s.dataset.dt' % name.lower())
+        uri = self.start_task('/gdc/md/' + project_id + '/tasks/%d/status')
+        return 200, {'entries': [{'link': uri, 'category': 'tasks-status'}]}
+
+    def get_maql_task(self, data, uri):
+        return 200, {'wTaskStatus': {'status': self.get_task_status(uri)}}
+
+    def execute_dml(self, data, project_id):
+        uri = self.start_task('/gdc/md/' + project_id + '/tasks/%d/dml')
+        return 200, {'uri': uri}
+
+    def get_dml_task(self, data, uri):
+        return 200, {'taskState': {'status': self.get_task_status(uri)}}
+
+    def pull(self, data, project_id):
+        dir_name = data['pullIntegration']
+        failed = None
+        try:
+            self.integrate(project_id, self.uploads[dir_name][DEFAULT_ARCHIVE_NAME])
+        except Exception:
+            failed = 'ERROR'
+        uri = self.start_task('/gdc/md/' + project_id + '/etl/task/%d', failed)
+        return 201, {'pullTask': {'uri': uri}}
+
+    def integrate(self, project_id, archive):
+        """
+        Load the rows of an uploaded archive into its dataset.
+        """
+        zip_file = ZipFile(StringIO(archive))
+        manifest = json.loads(zip_file.read(DLI_MANIFEST_FILENAME))['dataSetSLIManifest']
+        identifier = manifest['dataSet']
+        if identifier not in self.projects[project_id]['datasets']:
+            if not identifier.endswith('.dataset.dt'):
+                raise KeyError(identifier)
+            self.add_dataset(project_id, identifier)
+        rows = list(csv.DictReader(StringIO(zip_file.read(CSV_DATA_FILENAME))))
+        full = any(part.get('mode') == 'FULL' for part in manifest['parts'])
+        if full:
+            del self.rows[identifier][:]
+        self.rows[identifier].extend(rows)
+
+    def get_pull_task(self, data, uri):
+        return 200, {'taskStatus': self.get_task_status(uri)}
+
+    def mkcol(self, data, dir_name):
+        if dir_name in self.uploads:
+            return 405, 'Directory exists'
+        self.uploads[dir_name] = {}
+        return 201, ''
+
+    def put(self, data, dir_name, file_name):
+        if dir_name not in self.uploads:
+            return 409, 'Missing directory'
+        self.uploads[dir_name][file_name] = data
+        return 201, ''
+
+    def delete_upload(self, data, dir_name):
+        if self.uploads.pop(dir_name, None) is None:
+            return 404, 'Not found'
+        return 204, ''
+
+    def execute_report(self, data):
+        return 201, {'execResult': {'report': data['report_req']['report']}}
+
+    def export_report(self, data):
+        report = data['result_req']['result']['execResult']['report']
+        if report in self.failing:
+            return 400, self.error('Export of %s failed' % report)
+        uri = self.start_task('/gdc/exporter/result/%d')
+        self.exports[uri] = self.reports.get(report, self.report_csv)
+        return 201, {'uri': uri}
+
+    def get_report_export(self, data, uri):
+        if self.get_task_status(uri) == 'RUNNING':
+            return 202, {'uri': uri}
+        return 200, self.exports[uri], [('Content-Type', 'text/csv')]
+
+    def create_execution_context(self, data, project_id, user_id):
+        self.execution_contexts.append(data)
+        uri = '/gdc/projects/%s/users/%s/executioncontexts/%d' % (
+            project_id, user_id, next(self.ids)
+        )
+        return 201, {'uri': uri}
+
+    def export_dashboard(self, data, project_id):
+        url = data['clientExport']['url']
+        self.client_exports.append(url)
+        failed = 'ERROR' if any(failing in url for failing in self.failing) else None
+        uri = self.start_task('/gdc/exporter/clientexport/%d', failed)
+        return 201, {'asyncTask': {'link': {'poll': uri}}}
+
+    def get_dashboard_export(self, data, uri):
+        status = self.get_task_status(uri)
+        if status == 'RUNNING':
+            return 202, ''
+        if status != 'OK':
+            return 500, self.error('Export failed')
+        return 200, self.dashboard_pdf, [('Content-Type', 'application/pdf')]
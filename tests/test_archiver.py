@@ -1,15 +1,20 @@
 import sys
 import os
 import unittest
+from cStringIO import StringIO
 from tempfile import mkstemp
-from zipfile import ZipFile
+from zipfile import ZipFile, LargeZipFile
 
 
 from gooddataclient.project import Project
 from gooddataclient.archiver import (
     create_archive, write_tmp_csv_file,
-    csv_to_list, write_tmp_file
+    csv_to_list, write_tmp_file, read_in_chunks,
+    create_archive_stream, join_in_chunks, iter_csv_shards, get_row_encoder, EncoderPool,
+    iter_zip_stream
 )
+from gooddataclient import archiver
+from gooddataclient.pipeline import ListSlice
 
 from tests import logger, examples
 
@@ -60,6 +65,80 @@ class TestArchiver(unittest.TestCase):
                 example.sli_manifest, [], [], keep_csv=True
             )
 
+    def test_archive_stream(self):
+        for (example, ExampleDataset) in examples.examples:
+            dataset = ExampleDataset(Project(None))
+            archive = ''.join(create_archive_stream(
+                dataset.data(), example.sli_manifest,
+                example.dates, example.datetimes
+            ))
+            zip_file = ZipFile(StringIO(archive), "r")
+            self.assertEquals(None, zip_file.testzip())
+            self.assertEquals(zip_file.namelist(), ['data.csv', 'upload_info.json'])
+            self.assertListEqual(
+                csv_to_list(example.data_csv),
+                csv_to_list(zip_file.read('data.csv'))
+            )
+            zip_file.close()
+
+    def test_csv_workers(self):
+        for (example, ExampleDataset) in examples.examples:
+            dataset = ExampleDataset(Project(None))
+            args = (example.sli_manifest, example.dates, example.datetimes)
+            with open(write_tmp_csv_file(list(dataset.data()), *args)) as f:
+                expected = f.read()
+            with open(write_tmp_csv_file(list(dataset.data()), *args, workers=2)) as f:
+                self.assertEquals(expected, f.read())
+
+            row_encoder = get_row_encoder(*args)
+            shards = list(iter_csv_shards(
+                dataset.data(), example.sli_manifest, row_encoder, 2, shard_rows=1
+            ))
+            self.assertEquals(len(list(dataset.data())), len(shards))
+            self.assertEquals(expected.split('\r\n', 1)[1], ''.join(shards))
+
+            rows = list(dataset.data())
+            with EncoderPool(example.sli_manifest, row_encoder, 2, rows) as pool:
+                for data in (rows, ListSlice(rows, 0, len(rows)), dataset.data()):
+                    with open(write_tmp_csv_file(data, *args, encoder_pool=pool)) as f:
+                        self.assertEquals(expected, f.read())
+                half = len(rows) / 2
+                self.assertEquals(
+                    expected.split('\r\n', 1)[1],
+                    ''.join(pool.iter_shards(ListSlice(rows, 0, half), shard_rows=1))
+                    + ''.join(pool.iter_shards(ListSlice(rows, half, len(rows)), shard_rows=3))
+                )
+
+    def test_join_in_chunks(self):
+        self.assertEquals(
+            ['aaa', 'aa'], list(join_in_chunks(['a', 'aa', 'a', 'a'], 3))
+        )
+
+    def test_zip_stream_size(self):
+        consumed = []
+
+        def blocks():
+            for _ in range(100):
+                consumed.append(1)
+                yield os.urandom(1024)
+
+        max_size, archiver.ZIP_MAX_SIZE = archiver.ZIP_MAX_SIZE, 10 * 1024
+        try:
+            sent = []
+            stream = iter_zip_stream([('data.csv', blocks())])
+            self.assertRaises(LargeZipFile, lambda: sent.extend(stream))
+        finally:
+            archiver.ZIP_MAX_SIZE = max_size
+        # the upload stops before the limit, not once the entry is sent
+        self.assertTrue(sum(map(len, sent)) <= 10 * 1024)
+        self.assertTrue(len(consumed) < 100)
+
+    def test_read_in_chunks(self):
+        filename = write_tmp_file('a' * 10)
+        with open(filename, 'rb') as f:
+            self.assertEquals(['aaaa', 'aaaa', 'aa'], list(read_in_chunks(f, 4)))
+        os.remove(filename)
+
     def test_mkstemp_file_management(self):
         initial_number_of_opened_files = get_open_fds()
 
@@ -0,0 +1,55 @@
+import sys
+import threading
+import time
+import unittest
+
+from gooddataclient.asynchronous import AsyncClient
+from gooddataclient.exceptions import MaqlExecutionFailed
+
+from tests import logger
+
+
+logger.set_log_level(debug=('-v' in sys.argv))
+
+
+class FakeProject(object):
+
+    def __init__(self):
+        self.running = self.max_running = 0
+        self.lock = threading.Lock()
+
+    def execute_maql(self, maql, wait_for_finish=True):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.running, self.max_running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        if maql == 'fail':
+            raise MaqlExecutionFailed('MAQL %(maql)s failed', maql=maql)
+        return maql
+
+
+class TestAsyncClient(unittest.TestCase):
+
+    def test_concurrency(self):
+        project = FakeProject()
+        with AsyncClient(workers=4) as client:
+            results = [client.execute_maql(project, str(i)) for i in range(8)]
+            self.assertEquals([str(i) for i in range(8)], client.gather(results))
+        self.assertEquals(4, project.max_running)
+
+    def test_upload_workers(self):
+        with AsyncClient(workers=2) as client:
+            self.assertRaises(TypeError, client.upload, object(), workers=2)
+
+    def test_error(self):
+        project = FakeProject()
+        with AsyncClient(workers=2) as client:
+            results = [client.execute_maql(project, maql) for maql in ('a', 'fail')]
+            self.assertRaises(MaqlExecutionFailed, client.gather, results)
+            self.assertTrue(results[0].successful())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import sys
+import threading
+import unittest
+
+from gooddataclient.batch import run_batch
+from gooddataclient.polling import Poller
+
+from tests import logger
+
+
+logger.set_log_level(debug=('-v' in sys.argv))
+
+
+class TestRunBatch(unittest.TestCase):
+
+    def test_polling_not_blocked(self):
+        # two results are ready at once, the last one after a few polls:
+        # the busy worker must not stop the loop from polling it
+        polls = {'slow': 0}
+        polled = threading.Event()
+
+        def get_check(item, started):
+            def check():
+                if item != 'slow':
+                    return True, item
+                polls[item] += 1
+                if polls[item] < 3:
+                    return False, None
+                polled.set()
+                return True, item
+            return check
+
+        def finish(item, result):
+            if item == 'first':
+                polled.wait(1)
+            return polled.is_set()
+
+        values, errors = run_batch(
+            ['first', 'second', 'slow'], lambda item: item, get_check, finish,
+            Poller(interval=0.001), workers=1, max_in_flight=3
+        )
+        self.assertEquals(([True, True, True], {}), (values, errors))
+
+    def test_polled_when_started(self):
+        # the slow start must not delay the polling of the other task
+        polled = threading.Event()
+
+        def start(item):
+            if item == 'slow':
+                polled.wait(1)
+            return polled.is_set()
+
+        def get_check(item, started):
+            def check():
+                polled.set()
+                return True, started
+            return check
+
+        values, errors = run_batch(
+            ['slow', 'fast'], start, get_check, lambda item, result: result,
+            Poller(interval=0.001), workers=2
+        )
+        self.assertEquals(([True, False], {}), (values, errors))
+
+    def test_max_in_flight(self):
+        lock = threading.Lock()
+        in_flight = [0, 0]
+
+        def start(item):
+            if item == 2:
+                raise ValueError('failed start')
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+
+        def finish(item, result):
+            with lock:
+                in_flight[0] -= 1
+            return item
+
+        values, errors = run_batch(
+            range(10), start, lambda item, started: lambda: (True, None), finish,
+            Poller(interval=0.001), workers=3, max_in_flight=2
+        )
+        self.assertEquals([0, 1, None] + range(3, 10), values)
+        self.assertEquals([2], errors.keys())
+        self.assertEquals(2, in_flight[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import sys
+import threading
+import time
+import unittest
+
+from gooddataclient.bulk import get_upload_graph, run_graph
+from gooddataclient.exceptions import BulkUploadFailed
+from gooddataclient.project import Project
+
+from tests import logger, examples
+
+
+logger.set_log_level(debug=('-v' in sys.argv))
+
+
+class TestBulk(unittest.TestCase):
+
+    def test_upload_graph(self):
+        dataset_classes = [ExampleDataset for _, ExampleDataset in examples.examples]
+        datasets, date_dimensions, dependencies = get_upload_graph(Project(None), dataset_classes)
+
+        self.assertEquals(['department', 'forex', 'salary', 'worker'], sorted(datasets))
+        self.assertEquals({'payment': False, 'forex': True}, date_dimensions)
+        self.assertEquals(set(), dependencies[('dataset', 'department')])
+        self.assertEquals(set([('dataset', 'department')]), dependencies[('dataset', 'worker')])
+        self.assertEquals(
+            set([('dataset', 'worker'), ('date', 'payment')]),
+            dependencies[('dataset', 'salary')]
+        )
+        self.assertEquals(set([('date', 'forex')]), dependencies[('dataset', 'forex')])
+
+    def test_run_graph(self):
+        lock = threading.Lock()
+        finished = []
+
+        def get_task(node, fail=False):
+            def task():
+                time.sleep(0.01)
+                if fail:
+                    raise ValueError(node)
+                with lock:
+                    finished.append(node)
+            return task
+
+        tasks = dict((node, get_task(node)) for node in 'abcd')
+        dependencies = {'a': set(), 'b': set('a'), 'c': set('a'), 'd': set('bc')}
+        self.assertEquals({}, run_graph(tasks, dependencies, workers=2))
+        self.assertEquals('a', finished[0])
+        self.assertEquals('d', finished[-1])
+
+        tasks['b'] = get_task('b', fail=True)
+        errors = run_graph(tasks, dependencies, workers=2)
+        self.assertEquals(['b', 'd'], sorted(errors))
+        self.assertIsInstance(errors['b'], ValueError)
+        self.assertIsInstance(errors['d'], BulkUploadFailed)
+
+        dependencies = {'a': set('b'), 'b': set('a')}
+        self.assertRaises(BulkUploadFailed, run_graph, tasks, dependencies, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import sys
+import threading
+import time
+import unittest
+
+from requests.exceptions import HTTPError
+
+from gooddataclient.cache import TTLCache
+from gooddataclient.connection import Connection
+from gooddataclient.project import Project
+from gooddataclient.schema.state import State
+
+from tests import logger
+from tests.fake_server import FakeGoodData
+
+
+logger.set_log_level(debug=('-v' in sys.argv))
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.cache = TTLCache(10, clock=lambda: self.now)
+
+    def test_expiry(self):
+        self.cache.set('key', 'value')
+        self.now = 9
+        self.assertEquals('value', self.cache.get('key'))
+        self.now = 10
+        self.assertEquals(None, self.cache.get('key'))
+
+    def test_get_or_set(self):
+        values = iter([1, 2])
+        self.assertEquals(1, self.cache.get_or_set('key', values.next))
+        self.assertEquals(1, self.cache.get_or_set('key', values.next))
+        self.cache.invalidate('key')
+        self.assertEquals(2, self.cache.get_or_set('key', values.next))
+        self.cache.clear()
+        self.assertEquals(None, self.cache.get('key'))
+
+    def test_generation(self):
+        def compute():
+            self.cache.clear()
+            return 'stale'
+        self.assertEquals('stale', self.cache.get_or_set('key', compute))
+        self.assertEquals(None, self.cache.get('key'))
+
+        generation = self.cache.generation
+        self.cache.invalidate('other')
+        self.cache.set('key', 'stale', generation)
+        self.assertEquals(None, self.cache.get('key'))
+
+    def test_copies(self):
+        value = {'list': [1]}
+        self.cache.set('key', value)
+        value['list'].append(2)
+        self.cache.get('key')['list'].append(3)
+        self.assertEquals({'list': [1]}, self.cache.get('key'))
+
+    def test_single_flight(self):
+        calls = []
+
+        def compute():
+            calls.append(None)
+            time.sleep(0.02)
+            return len(calls)
+        threads = [
+            threading.Thread(target=self.cache.get_or_set, args=('key', compute))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(1, len(calls))
+        self.assertEquals({}, self.cache.computing)
+
+    def test_disabled(self):
+        cache = TTLCache(0)
+        cache.set('key', 'value')
+        self.assertEquals(None, cache.get('key'))
+
+
+class TestMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeGoodData(latency=0.002).start()
+        self.connection = Connection(
+            'user', 'password', host=self.server.url, webdav_host=self.server.url
+        )
+        project_id = self.server.add_project('test')
+        self.pk = self.server.add_object(project_id, 'column', identifier='d_forex_id.nm_id')
+        self.attr = self.server.add_object(project_id, 'attribute', {'pk': [{'data': self.pk}]})
+        self.dataset = self.server.add_dataset(project_id, 'dataset.forex')
+        self.server.objects[self.dataset]['dataSet']['content']['attributes'] = [self.attr]
+        self.project = Project(self.connection).load(id=project_id)
+        self.state = State(self.project)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def get_uris(self):
+        return [path for method, path in self.server.requests
+                if method == 'GET' and path.startswith('/gdc/md/')]
+
+    def get_all(self):
+        self.state.get_column_uris('forex')
+        self.state.get_column_pk_identifier(self.state.get_column_detail(self.attr))
+
+    def test_cache(self):
+        self.get_all()
+        self.get_all()
+        self.assertEquals(
+            ['/gdc/md/%s/data/sets' % self.project.id, self.dataset, self.attr, self.pk],
+            self.get_uris()
+        )
+        self.project.metadata_cache.clear()
+        self.get_all()
+        self.assertEquals(8, len(self.get_uris()))
+
+    def test_bulk_cache(self):
+        self.state.get_column_details_and_pks([self.attr])
+        self.assertEquals([[self.attr], [self.pk]], self.server.bulk_gets)
+        self.state.get_column_details_and_pks([self.attr])
+        self.state.get_column_pk_identifier(self.state.get_column_detail(self.attr))
+        self.assertEquals(2, len(self.server.bulk_gets))
+        self.assertEquals([], self.get_uris())
+
+
+class TestColumnDetails(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeGoodData(latency=0.002).start()
+        connection = Connection(
+            'user', 'password', host=self.server.url, webdav_host=self.server.url
+        )
+        project_id = self.server.add_project('test')
+        self.uris = []
+        for i in range(20):
+            pk = self.server.add_object(project_id, 'column', identifier='pk%d' % i)
+            self.uris.append(self.server.add_object(
+                project_id, 'attribute', {'pk': [{'data': pk}]}, 'attr%d' % i
+            ))
+        self.missing = '/gdc/md/%s/obj/0' % project_id
+        self.state = State(Project(connection).load(id=project_id))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_order(self):
+        self.state.OBJECTS_GET_LIMIT = 3
+        details = self.state.get_column_details(self.uris)
+        self.assertEquals(['attr%d' % i for i in range(20)], [d['meta']['identifier'] for d in details])
+        self.assertEquals(
+            [(details[i], 'pk%d' % i) for i in range(20)],
+            self.state.get_column_details_and_pks(self.uris)
+        )
+        self.assertRaises(HTTPError, self.state.get_column_details, self.uris + [self.missing])
+        self.assertTrue(all(len(chunk) <= 3 for chunk in self.server.bulk_gets))
+
+    def test_fallback(self):
+        self.server.bulk_get = False
+        self.assertEquals(
+            [('attr%d' % i, 'pk%d' % i) for i in range(20)],
+            [(d['meta']['identifier'], pk) for d, pk in self.state.get_column_details_and_pks(self.uris)]
+        )
+        self.assertEquals(40, len([
+            path for method, path in self.server.requests if method == 'GET' and '/obj/' in path
+        ]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import sys
+import unittest
+from datetime import datetime
+
+try:
+    import numpy
+    import pandas
+except ImportError:
+    numpy = pandas = None
+
+from gooddataclient.archiver import write_tmp_csv_file, get_row_encoder
+from gooddataclient.columnar import (
+    is_columnar, iter_columnar_rows, iter_columnar_chunks, get_max
+)
+from gooddataclient.formatter import RowEncoder
+from gooddataclient.project import Project
+
+from tests import logger, examples
+
+
+logger.set_log_level(debug=('-v' in sys.argv))
+
+
+@unittest.skipIf(pandas is None, 'pandas is not installed')
+class TestColumnar(unittest.TestCase):
+
+    def test_is_columnar(self):
+        self.assertTrue(is_columnar(pandas.DataFrame({'a': [1]})))
+        self.assertTrue(is_columnar({'a': numpy.array([1])}))
+        self.assertFalse(is_columnar([{'a': 1}]))
+        self.assertFalse(is_columnar({'a': [1]}))
+
+    def test_examples(self):
+        for (example, ExampleDataset) in examples.examples:
+            dataset = ExampleDataset(Project(None))
+            encoder = dataset.get_row_encoder()
+            rows = list(dataset.data())
+            frame = pandas.DataFrame(rows, columns=encoder.columns)
+            self.assertEquals(
+                [encoder(row) for row in rows],
+                [list(row) for row in iter_columnar_rows(frame, encoder, block_rows=2)]
+            )
+
+    def test_csv_file(self):
+        for (example, ExampleDataset) in examples.examples:
+            dataset = ExampleDataset(Project(None))
+            rows = list(dataset.data())
+            frame = pandas.DataFrame(rows)
+            args = (example.sli_manifest, example.dates, example.datetimes)
+            with open(write_tmp_csv_file(rows, *args)) as f:
+                expected = f.read()
+            with open(write_tmp_csv_file(frame, *args)) as f:
+                self.assertEquals(expected, f.read())
+
+    def test_values(self):
+        encoder = RowEncoder(['date', 'date_dt', 'time', 'time_dt', 'time_tm', 'tm_time_id',
+                              'flag', 'count', 'price', 'name'], ['date'], ['time'])
+        columns = {
+            'date': numpy.array([datetime(2054, 12, 6), None, ''], dtype=object),
+            'time': numpy.array(['2013-01-02T03:04:05', 'NaT', '1900-01-01'], dtype='datetime64[ns]'),
+            'flag': numpy.array([True, False, True]),
+            'count': numpy.array([1, 2, 3]),
+            'price': numpy.array([1.5, numpy.nan, 2]),
+            'name': numpy.array([u'\xe9t\xe9', None, 'NULL'], dtype=object),
+        }
+        self.assertEquals([
+            ('2049-12-06', '54762', '2013-01-02 03:04:05', '41275', '11045', '11045',
+             'yes', '1', '1.5', '\xc3\xa9t\xc3\xa9'),
+            ('', '0', '', '0', '0', '0', 'no', '2', 'NULL', 'NULL'),
+            ('', '0', '1900-01-01 00:00:00', '1', '0', '0', 'yes', '3', '2.0', 'NULL'),
+        ], list(iter_columnar_rows(columns, encoder)))
+
+    def test_floats(self):
+        encoder = RowEncoder(['price'], [], [])
+        prices = [0.1 + 0.2, 1 / 3.0, 1e20, 2.5]
+        self.assertEquals(
+            [encoder({'price': price}) for price in prices],
+            [list(row) for row in iter_columnar_rows({'price': numpy.array(prices)}, encoder)]
+        )
+
+    def test_chunks(self):
+        columns = {'a': numpy.arange(5)}
+        chunks = list(iter_columnar_chunks(columns, 2))
+        self.assertEquals([[0, 1], [2, 3], [4]], [list(chunk['a']) for chunk in chunks])
+        frame = pandas.DataFrame(columns)
+        self.assertEquals([2, 2, 1], [len(chunk) for chunk in iter_columnar_chunks(frame, 2)])
+
+    def test_max(self):
+        frame = pandas.DataFrame({
+            'date': [datetime(2013, 1, 2), None, datetime(2012, 1, 1)],
+            'price': [1.5, numpy.nan, 0],
+            'name': [None, 'b', 'a'],
+        })
+        self.assertEquals(datetime(2013, 1, 2), get_max(frame, 'date'))
+        self.assertEquals(1.5, get_max(frame, 'price'))
+        self.assertEquals('b', get_max(frame, 'name'))
+        self.assertEquals(None, get_max({'id': numpy.array([])}, 'id'))
+        self.assertEquals(3, get_max({'id': numpy.arange(4)}, 'id'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,9 +3,10 @@ import os
 import unittest
 from zipfile import ZipFile
 
+import requests
 from requests.exceptions import HTTPError
 
-from gooddataclient.connection import Connection
+from gooddataclient.connection import Connection, Webdav, create_session
 from gooddataclient.exceptions import (
     AuthenticationError, GoodDataTotallyDown, ReportExportFailed
 )
@@ -77,5 +78,57 @@ class TestConnection(unittest.TestCase):
         self.assertRaises(HTTPError, self.connection.get, '/wronguri')
 
 
+class TestSession(unittest.TestCase):
+
+    def test_create_session(self):
+        session = create_session(pool_connections=2, pool_maxsize=5)
+        adapter = session.get_adapter('https://secure.gooddata.com')
+        self.assertEquals(5, adapter.poolmanager.connection_pool_kw['maxsize'])
+        self.assertNotEquals('close', session.headers.get('Connection'))
+        session = create_session(keep_alive=False)
+        self.assertEquals('close', session.headers['Connection'])
+
+    def test_webdav_session(self):
+        session = create_session()
+        self.assertIs(session, Webdav('', '', session=session).session)
+
+    def test_upload_archive_length(self):
+        class PreparingSession(object):
+            prepared = []
+
+            def request(self, method, url, **kwargs):
+                kwargs.pop('auth')
+                request = requests.Request(method, url, **kwargs).prepare()
+                self.prepared.append(request)
+                response = requests.Response()
+                response.status_code = 201
+                return response
+
+        session = PreparingSession()
+        archive = write_tmp_file('zip content')
+        Webdav('', '', session=session).upload_archive(archive)
+        put = session.prepared[1]
+        self.assertEquals('11', put.headers['Content-Length'])
+        self.assertNotIn('Transfer-Encoding', put.headers)
+        self.assertFalse(os.path.exists(archive))
+
+    def test_upload_archive_failure(self):
+        class FailingPutSession(object):
+            methods = []
+
+            def request(self, method, url, **kwargs):
+                self.methods.append(method.upper())
+                response = requests.Response()
+                response.status_code = 500 if method == 'put' else 201
+                return response
+
+        session = FailingPutSession()
+        archive = write_tmp_file('zip content')
+        self.assertRaises(HTTPError, Webdav('', '', session=session).upload_archive, archive)
+        # the directory created for the archive is removed
+        self.assertEquals(['MKCOL', 'PUT', 'DELETE'], session.methods)
+        self.assertFalse(os.path.exists(archive))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,9 +1,12 @@
 import os
+import shutil
 import sys
+import tempfile
 import unittest
 
 from gooddataclient.connection import Connection
-from gooddataclient.exceptions import DashboardExportError
+from gooddataclient.exceptions import DashboardExportError, BatchExportFailed
+from gooddataclient.polling import Poller
 from gooddataclient.project import Project
 from gooddataclient.dashboard import Dashboard
 
@@ -14,6 +17,7 @@ from tests.credentials import (
     test_dashboard_project_id
 )
 from tests import logger
+from tests.fake_server import FakeGoodData, DASHBOARD_PDF
 
 logger.set_log_level(debug=('-v' in sys.argv))
 
@@ -73,5 +77,86 @@ class TestDashboard(unittest.TestCase):
         self.assertTrue(self.dashboard.saved_dashboard_is_empty(self.output_path))
         os.remove(self.output_path)
 
+
+class TestExportPdfs(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeGoodData(task_duration=0.01).start()
+        self.project_id = self.server.add_project('test')
+        self.dashboard = self.get_dashboard(self.server, 'user')
+        self.directory = tempfile.mkdtemp()
+        Dashboard._execution_contexts.clear()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def get_dashboard(self, server, user_id):
+        connection = Connection(
+            'user', 'password', host=server.url, webdav_host=server.url,
+            poller=Poller(interval=0.002)
+        )
+        project = Project(connection).load(id=self.project_id)
+        return Dashboard(project, user_id, dashboard_id='1', id='tab', name='dashboard')
+
+    def get_exports(self, pages):
+        filters = [[{'object_id': 1, 'constraint': {'from': -1, 'to': -1}}],
+                   [{'object_id': 1, 'constraint': {'to': -3, 'from': -3}}]]
+        return [(
+            filters[index % 2],
+            {'attribute': 'label.page.page_name', 'value': page},
+            os.path.join(self.directory, '%s.pdf' % page)
+        ) for index, page in enumerate(pages)]
+
+    def test_export_pdfs(self):
+        pages = ['page%d' % i for i in range(10)]
+        self.dashboard.export_pdfs(self.get_exports(pages), workers=3)
+        self.assertEquals(2, len(self.server.execution_contexts))
+        self.assertEquals(None, self.dashboard.execution_context_response_uri)
+        self.assertEquals(None, self.dashboard.client_export_response_uri)
+        self.assertEquals(
+            sorted(pages),
+            sorted(url.split('page_name=', 1)[1].split('#', 1)[0]
+                   for url in self.server.client_exports)
+        )
+        for page in pages:
+            with open(os.path.join(self.directory, '%s.pdf' % page)) as f:
+                self.assertEquals(DASHBOARD_PDF, f.read())
+
+    def test_execution_context_cache(self):
+        exports = self.get_exports(['a', 'b'])
+        self.dashboard.export_pdfs(exports)
+        self.dashboard.save_as_pdf(*exports[0])
+        self.assertEquals(2, len(self.server.execution_contexts))
+        self.assertTrue(self.dashboard.execution_context_response_uri)
+        self.assertTrue(self.dashboard.client_export_response_uri)
+
+        self.get_dashboard(self.server, 'other').save_as_pdf(*exports[0])
+        self.assertEquals(3, len(self.server.execution_contexts))
+
+        Dashboard._execution_contexts.clear()
+        self.dashboard.save_as_pdf(*exports[0])
+        self.assertEquals(4, len(self.server.execution_contexts))
+
+        # the same project on another host
+        other_server = FakeGoodData().start()
+        try:
+            other_server.add_project('test', self.project_id)
+            self.get_dashboard(other_server, 'user').save_as_pdf(*exports[0])
+        finally:
+            other_server.stop()
+        self.assertEquals(4, len(self.server.execution_contexts))
+        self.assertEquals(1, len(other_server.execution_contexts))
+
+    def test_errors(self):
+        self.server.failing.add('page_name=failing')
+        try:
+            self.dashboard.export_pdfs(self.get_exports(['a', 'failing', 'b']), workers=2)
+        except BatchExportFailed, err:
+            self.assertEquals([1], err.error_info['errors'].keys())
+        else:
+            self.fail('BatchExportFailed not raised')
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'b.pdf')))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,134 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from gooddataclient.connection import Connection
+from gooddataclient.dashboard import Dashboard
+from gooddataclient.metrics import Metrics
+from gooddataclient.polling import Poller
+from gooddataclient.project import Project
+from gooddataclient.report import Report, export_reports
+from gooddataclient.tracing import RecordingTracer
+
+from tests import logger, examples
+from tests.fake_server import FakeGoodData, REPORT_CSV, DASHBOARD_PDF
+
+
+logger.set_log_level(debug=('-v' in sys.argv))
+
+
+class TestFakeServer(unittest.TestCase):
+    """
+    Run the client against the offline stand-in of GoodData.
+    """
+
+    def setUp(self):
+        self.server = FakeGoodData(task_duration=0.02).start()
+        self.metrics = Metrics()
+        self.tracer = RecordingTracer()
+        self.connection = Connection(
+            'user', 'password', host=self.server.url, webdav_host=self.server.url,
+            poller=Poller(interval=0.005, hooks=[self.metrics]), hooks=[self.metrics], tracer=self.tracer
+        )
+        self.project = Project(self.connection).load(id=self.server.add_project('test'))
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def test_upload(self):
+        for (example, ExampleDataset) in examples.hr_examples:
+            dataset = ExampleDataset(self.project)
+            dataset.upload()
+            self.assertEquals(
+                len(dataset.data()), len(self.server.rows['dataset.' + dataset.identifier])
+            )
+            dataset.upload(stream=True)
+            self.assertEquals(
+                2 * len(dataset.data()), len(self.server.rows['dataset.' + dataset.identifier])
+            )
+        self.assertEquals({}, self.server.uploads)
+
+        upload = self.tracer.get_spans('upload')[0]
+        self.assertEquals(12, upload.attributes['rows'])
+        names = set(span.name for span in self.tracer.spans if span.parent is upload)
+        self.assertEquals(
+            set(['metadata', 'create', 'data', 'encode', 'zip', 'mkcol', 'put',
+                 'integrate', 'poll', 'delete']),
+            names
+        )
+        stats = self.metrics.as_dict()
+        self.assertEquals(
+            6, stats['requests']['PUT /uploads/{dir}/upload.zip']['statuses'][201]
+        )
+        self.assertEquals(6, stats['polls']['/gdc/md/{project}/etl/task/{id}']['count'])
+
+    def test_upload_chunks(self):
+        dataset = examples.hr_examples[0][1](self.project)
+        dataset.upload(chunk_rows=5)
+        self.assertEquals(
+            len(dataset.data()), len(self.server.rows['dataset.' + dataset.identifier])
+        )
+        upload = self.tracer.get_spans('upload')[0]
+        self.assertEquals(3, len(self.tracer.get_spans('put')))
+        for span in self.tracer.spans:
+            if span is not upload:
+                ancestor = span.parent
+                while ancestor not in (None, upload):
+                    ancestor = ancestor.parent
+                self.assertIs(upload, ancestor, span)
+
+    def test_upload_data_arguments(self):
+        dataset = examples.hr_examples[0][1](self.project)
+        data, calls = dataset.data, []
+
+        def record_data(*args, **kwargs):
+            calls.append((args, kwargs))
+            return data()
+        dataset.data = record_data
+        dataset.upload(False, None, False, False, None, 'since', chunk_rows=5, limit=10)
+        self.assertEquals([(('since',), {'limit': 10})], calls)
+        self.assertEquals(len(data()), len(self.server.rows['dataset.' + dataset.identifier]))
+
+    def test_delete_dataset(self):
+        dataset = examples.hr_examples[0][1](self.project)
+        datasets = self.server.projects[self.project.id]['datasets']
+        dataset.upload()
+        dataset.delete(dataset.schema_name)
+        self.assertNotIn('dataset.' + dataset.identifier, datasets)
+        dataset.upload()
+        self.assertIn('dataset.' + dataset.identifier, datasets)
+
+    def test_project(self):
+        project = Project(self.connection).create('created', 'token')
+        self.assertEquals(project.id, Project(self.connection).load(name='created').id)
+        project.delete()
+        self.assertNotIn(project.id, self.server.projects)
+
+    def test_report(self):
+        reports = [Report(self.project, id=str(id)) for id in range(3)]
+        self.assertEquals(REPORT_CSV, reports[0].get_report())
+        paths = [os.path.join(self.directory, 'report%d.csv' % index) for index in range(3)]
+        export_reports(zip(reports, paths))
+        for path in paths:
+            with open(path) as f:
+                self.assertEquals(REPORT_CSV, f.read())
+
+    def test_dashboard(self):
+        dashboard = Dashboard(self.project, 'user', dashboard_id='1', id='tab', name='dashboard')
+        filters = [{'object_id': 1, 'constraint': {'type': 'floating', 'from': -1, 'to': -1}}]
+        paths = [os.path.join(self.directory, 'dashboard%d.pdf' % index) for index in range(2)]
+        dashboard.export_pdfs([
+            (filters, {'attribute': 'label.page.name', 'value': 'page%d' % index}, path)
+            for index, path in enumerate(paths)
+        ])
+        for path in paths:
+            with open(path, 'rb') as f:
+                self.assertEquals(DASHBOARD_PDF, f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
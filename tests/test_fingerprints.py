@@ -0,0 +1,69 @@
+import os
+import sys
+import unittest
+from tempfile import mkstemp
+
+from gooddataclient.fingerprints import RowFingerprints
+from gooddataclient.formatter import RowEncoder
+
+from tests import logger
+
+
+logger.set_log_level(debug=('-v' in sys.argv))
+
+
+class TestRowFingerprints(unittest.TestCase):
+
+    def setUp(self):
+        fp, self.path = mkstemp()
+        os.close(fp)
+        self.store = RowFingerprints(self.path)
+        self.encoder = RowEncoder(['id', 'name'], [], [])
+
+    def tearDown(self):
+        self.store.close()
+        os.remove(self.path)
+
+    def upload(self, rows, full_upload=False):
+        changes = {}
+        uploaded = list(self.store.iter_changed_rows(
+            'dataset', rows, self.encoder, 'id', changes, full_upload
+        ))
+        self.store.update('dataset', changes, replace=full_upload)
+        return uploaded
+
+    def encode(self, rows):
+        return [self.encoder(row) for row in rows]
+
+    def test_changed_rows(self):
+        rows = [{'id': 1, 'name': u'\xe9'}, {'id': 2, 'name': 'b'}]
+        self.assertEquals(self.encode(rows), self.upload(rows))
+        self.assertEquals([], self.upload(rows))
+
+        rows = [{'id': 1, 'name': u'\xe9'}, {'id': 2, 'name': 'c'}, (3, 'd')]
+        self.assertEquals(self.encode(rows[1:]), self.upload(rows))
+        self.assertEquals([], self.upload(rows))
+
+    def test_encoded_rows(self):
+        rows = self.upload([{'id': 1, 'name': u'\xe9'}, (2, 'NULL')])
+        self.assertEquals([['1', '\xc3\xa9'], ['2', 'NULL']], rows)
+        self.assertEquals(rows, self.encode(rows))
+        self.assertIs(rows[0], self.encoder(rows[0]))
+
+    def test_not_recorded(self):
+        rows = [{'id': 1, 'name': 'a'}]
+        self.store.iter_changed_rows('dataset', rows, self.encoder, 'id', {}).next()
+        self.assertEquals(self.encode(rows), self.upload(rows))
+
+    def test_full_upload(self):
+        self.upload([{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}])
+        rows = [{'id': 2, 'name': 'b'}]
+        self.assertEquals(self.encode(rows), self.upload(rows, full_upload=True))
+        self.assertEquals({'2'}, set(self.store.get('dataset', ['1', '2'])))
+
+        self.store.clear('dataset')
+        self.assertEquals({}, self.store.get('dataset', ['1', '2']))
+
+
+if __name__ == '__main__':
+    unittest.main()
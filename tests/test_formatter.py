@@ -1,10 +1,14 @@
+import pickle
 import sys
 import unittest
+from collections import namedtuple
+import sqlite3
 from datetime import datetime
 
-from gooddataclient.formatter import format_dates
+from gooddataclient.formatter import format_dates, csv_encode_dict, RowEncoder
+from gooddataclient.project import Project
 
-from tests import logger
+from tests import logger, examples
 
 
 logger.set_log_level(debug=('-v' in sys.argv))
@@ -19,5 +23,56 @@ class TestText(unittest.TestCase):
         self.assertEquals('', format_dates({'date': ''}, dates, [])['date'])
 
 
+class TestRowEncoder(unittest.TestCase):
+
+    def test_encode(self):
+        for (example, ExampleDataset) in examples.examples:
+            dataset = ExampleDataset(Project(None))
+            fieldnames = [part['columnName'] for part in example.sli_manifest['dataSetSLIManifest']['parts']]
+            encoder = RowEncoder(fieldnames, example.dates, example.datetimes)
+            for line in dataset.data():
+                encoded = encoder(line)
+                line = csv_encode_dict(format_dates(line, example.dates, example.datetimes))
+                self.assertEquals([line.get(name, '') for name in fieldnames], encoded)
+
+    def test_encode_sequence(self):
+        for (example, ExampleDataset) in examples.examples:
+            dataset = ExampleDataset(Project(None))
+            encoder = dataset.get_row_encoder()
+            self.assertEquals([name for name, _ in dataset._columns], encoder.columns)
+            Row = namedtuple('Row', encoder.columns)
+            for line in dataset.data():
+                values = [line.get(name, '') for name in encoder.columns]
+                self.assertEquals(encoder(line), encoder(tuple(values)))
+                self.assertEquals(encoder(line), encoder(Row(*values)))
+
+    def test_encode_cursor_row(self):
+        encoder = RowEncoder(['id', 'name'], [], [])
+        db = sqlite3.connect(':memory:')
+        db.row_factory = sqlite3.Row
+        row = db.execute("SELECT 1 AS id, 'a' AS name").fetchone()
+        self.assertEquals(['1', 'a'], encoder(row))
+        self.assertRaises(ValueError, encoder, (1,))
+
+    def test_extra_fields(self):
+        encoder = RowEncoder(['id', 'name'], [], [])
+        self.assertRaises(ValueError, encoder, {'id': 1, 'name': 'a', 'extra': 2})
+        # only the first row is checked
+        encoder = RowEncoder(['id', 'name'], [], [])
+        self.assertEquals(['1', 'a'], encoder({'id': 1, 'name': 'a'}))
+        self.assertEquals(['2', 'b'], encoder({'id': 2, 'name': 'b', 'extra': 2}))
+
+    def test_dates(self):
+        encoder = RowEncoder(['date', 'date_dt', 'value'], ['date'], [])
+        self.assertEquals(['2049-12-06', '54762', 'NULL'], encoder({'date': datetime(2054, 12, 6), 'value': None}))
+        self.assertEquals(['', '0', ''], encoder({'date': ''}))
+        self.assertEquals(['', '0', 'yes'], encoder({'date': None, 'value': True}))
+
+    def test_pickle(self):
+        encoder = RowEncoder(['date', 'date_dt', 'value'], ['date'], [])
+        row = {'date': datetime(2013, 1, 2), 'value': 1}
+        self.assertEquals(encoder(row), pickle.loads(pickle.dumps(encoder))(row))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,213 @@
+import sys
+import unittest
+
+from requests.exceptions import HTTPError
+
+from gooddataclient.connection import Webdav
+from gooddataclient.exceptions import PollingCancelled, PollingTimeout
+from gooddataclient.metrics import (
+    Histogram, Metrics, PollInfo, RequestInfo, get_uri_template
+)
+from gooddataclient.polling import Poller
+
+from tests import logger
+
+
+logger.set_log_level(debug=('-v' in sys.argv))
+
+
+class FakeResponse(object):
+
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+        self.headers = {'content-length': str(len(content))}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            err = HTTPError('%s Error' % self.status_code)
+            err.response = self
+            raise err
+
+
+class FakeSession(object):
+
+    def __init__(self):
+        self.sent = []
+
+    def request(self, method, url, data=None, **kwargs):
+        if data is not None and not isinstance(data, basestring):
+            data = ''.join(data)
+        self.sent.append(data)
+        if url.endswith('/missing/'):
+            return FakeResponse('not found', status_code=404)
+        return FakeResponse('x' * 10)
+
+
+class TestUriTemplate(unittest.TestCase):
+
+    def test_get_uri_template(self):
+        project = 'a1b2c3d4e5f6g7h8i9j0k1l2m3n4o5p6'
+        for uri, template in (
+            ('/gdc/md/%s/obj/123' % project, '/gdc/md/{project}/obj/{id}'),
+            ('https://secure.gooddata.com/gdc/md/%s/ldm/manage' % project,
+             '/gdc/md/{project}/ldm/manage'),
+            ('/gdc/projects/%s/users/%s/executioncontexts' % (project, 'user1'),
+             '/gdc/projects/{project}/users/{user}/executioncontexts'),
+            ('/gdc/md/%s/tasks/%s/status' % (project, 'f1e2d3c4b5a69788'),
+             '/gdc/md/{project}/tasks/{id}/status'),
+            ('/uploads/tmpab12/upload.zip', '/uploads/{dir}/upload.zip'),
+            ('/gdc/exporter/result/%s/123?download=1' % project,
+             '/gdc/exporter/result/{id}/{id}'),
+            ('/gdc/account/login', '/gdc/account/login'),
+            ('/gdc/md/', '/gdc/md/'),
+        ):
+            self.assertEquals(template, get_uri_template(uri))
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram(self):
+        histogram = Histogram((1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value)
+        self.assertEquals([(1, 2), (5, 3), ('+Inf', 4)], histogram.get_cumulative_counts())
+        self.assertEquals(14.5, histogram.sum)
+        self.assertEquals(4, histogram.count)
+
+    def test_aggregation(self):
+        metrics = Metrics(latency_buckets=(0.1, 1))
+        for uri, status, latency in (('/gdc/md/p1234567890abcdef/obj/1', 200, 0.05),
+                                     ('/gdc/md/p1234567890abcdef/obj/2', 200, 0.5),
+                                     ('/gdc/md/p1234567890abcdef/obj/3', 404, 2)):
+            metrics.on_request(RequestInfo('get', uri, get_uri_template(uri), status, 10, 1, latency))
+        metrics.on_poll(PollInfo(
+            '/gdc/md/p/tasks/1/status', '/gdc/md/{project}/tasks/{id}/status', 3, 0.5, 'done'
+        ))
+        metrics.on_poll(PollInfo(
+            '/gdc/md/p/tasks/2/status', '/gdc/md/{project}/tasks/{id}/status', 5, 10, 'timeout'
+        ))
+        metrics.on_poll(PollInfo(0, None, 1, 0.05, 'done'))
+
+        stats = metrics.as_dict()
+        requests = stats['requests']['GET /gdc/md/{project}/obj/{id}']
+        self.assertEquals(3, requests['count'])
+        self.assertEquals({200: 2, 404: 1}, requests['statuses'])
+        self.assertEquals(30, requests['bytes_in'])
+        self.assertEquals(3, requests['bytes_out'])
+        self.assertEquals([(0.1, 1), (1, 2), ('+Inf', 3)], requests['latency']['buckets'])
+        polls = stats['polls']['/gdc/md/{project}/tasks/{id}/status']
+        self.assertEquals(8, polls['iterations']['sum'])
+        self.assertEquals({'done': 1, 'timeout': 1}, polls['outcomes'])
+        self.assertEquals(1, stats['polls']['{unknown}']['count'])
+
+        text = metrics.to_prometheus()
+        self.assertIn('# TYPE gooddata_requests_total counter', text)
+        self.assertIn(
+            'gooddata_requests_total{method="GET",uri="/gdc/md/{project}/obj/{id}",status="404"} 1',
+            text
+        )
+        self.assertIn(
+            'gooddata_request_duration_seconds_bucket{method="GET",uri="/gdc/md/{project}/obj/{id}",le="1"} 2',
+            text
+        )
+        self.assertIn(
+            'gooddata_polls_total{uri="/gdc/md/{project}/tasks/{id}/status",outcome="timeout"} 1',
+            text
+        )
+        self.assertIn(
+            'gooddata_poll_iterations_count{uri="/gdc/md/{project}/tasks/{id}/status"} 2', text
+        )
+
+        metrics.reset()
+        self.assertEquals({'requests': {}, 'polls': {}}, metrics.as_dict())
+
+    def test_connection_hooks(self):
+        metrics = Metrics()
+        session = FakeSession()
+        webdav = Webdav('', '', session=session, hooks=[metrics])
+        webdav.mkcol('/uploads/tmpab12/')
+        webdav.put('/uploads/tmpab12/upload.zip', (block for block in ('ab', 'cde')), {})
+        self.assertRaises(HTTPError, webdav.mkcol, '/uploads/missing/')
+        self.assertEquals('abcde', session.sent[1])
+
+        stats = metrics.as_dict()['requests']
+        self.assertEquals({200: 1, 404: 1}, stats['MKCOL /uploads/{dir}/']['statuses'])
+        self.assertEquals(19, stats['MKCOL /uploads/{dir}/']['bytes_in'])
+        self.assertEquals(5, stats['PUT /uploads/{dir}/upload.zip']['bytes_out'])
+
+    def test_hook_added_during_request(self):
+        metrics = Metrics()
+        session = FakeSession()
+        webdav = Webdav('', '', session=session)
+        send = session.request
+
+        def request(*args, **kwargs):
+            webdav.add_hook(metrics)
+            return send(*args, **kwargs)
+        session.request = request
+        webdav.mkcol('/uploads/tmpab12/')
+        self.assertEquals({}, metrics.as_dict()['requests'])
+        webdav.mkcol('/uploads/tmpab12/')
+        self.assertEquals(1, len(metrics.as_dict()['requests']))
+
+    def test_failing_hook(self):
+        class FailingHook(object):
+            def on_request(self, info):
+                raise ValueError(info)
+
+        metrics = Metrics()
+        webdav = Webdav('', '', session=FakeSession(), hooks=[FailingHook(), metrics])
+        webdav.mkcol('/uploads/tmpab12/')
+        self.assertEquals(1, len(metrics.as_dict()['requests']))
+
+    def test_poll_hooks(self):
+        metrics = Metrics()
+        poller = Poller(interval=0.001, hooks=[metrics])
+        counts = {}
+
+        def get_check(key, checks):
+            def check():
+                counts[key] = counts.get(key, 0) + 1
+                return counts[key] >= checks, key
+            return check
+
+        poller.poll(get_check('/gdc/md/project1234567890ab/tasks/1/status', 3),
+                    '/gdc/md/project1234567890ab/tasks/1/status')
+        list(poller.iter_poll_all([
+            ('/gdc/md/project1234567890ab/tasks/2/status',
+             get_check('/gdc/md/project1234567890ab/tasks/2/status', 2)),
+            (0, get_check(0, 1)),
+        ]))
+        polls = metrics.as_dict()['polls']
+        stats = polls['/gdc/md/{project}/tasks/{id}/status']
+        self.assertEquals(2, stats['count'])
+        self.assertEquals(5, stats['iterations']['sum'])
+        self.assertEquals(1, polls['{unknown}']['iterations']['sum'])
+        self.assertEquals({'done': 2}, stats['outcomes'])
+
+    def test_poll_hooks_outcomes(self):
+        metrics = Metrics()
+        uri = '/gdc/md/project1234567890ab/tasks/1/status'
+        poller = Poller(interval=0.001, timeout=0.005, hooks=[metrics])
+        self.assertRaises(PollingTimeout, poller.poll, lambda: (False, None), uri)
+        self.assertRaises(PollingTimeout, list, poller.iter_poll_all([
+            (uri, lambda: (False, None)), (0, lambda: (True, None))
+        ]))
+
+        def check():
+            raise ValueError('failed check')
+        self.assertRaises(ValueError, poller.poll, check, uri)
+        poller = Poller(interval=0.001, cancel=lambda: True, hooks=[metrics])
+        self.assertRaises(PollingCancelled, poller.poll, lambda: (False, None), uri)
+
+        polls = metrics.as_dict()['polls']
+        self.assertEquals(
+            {'timeout': 2, 'error': 1, 'cancelled': 1},
+            polls['/gdc/md/{project}/tasks/{id}/status']['outcomes']
+        )
+        self.assertEquals({'done': 1}, polls['{unknown}']['outcomes'])
+
+
+if __name__ == '__main__':
+    unittest.main()
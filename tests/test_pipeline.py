@@ -0,0 +1,61 @@
+import sys
+import time
+import unittest
+
+from gooddataclient.pipeline import Pipeline, iter_chunks, iter_slices
+
+from tests import logger
+
+
+logger.set_log_level(debug=('-v' in sys.argv))
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_iter_chunks(self):
+        self.assertEquals([[0, 1], [2, 3], [4]], list(iter_chunks(xrange(5), 2)))
+        self.assertEquals([], list(iter_chunks([], 2)))
+
+    def test_iter_slices(self):
+        items = range(5)
+        slices = list(iter_slices(items, 2))
+        self.assertEquals([[0, 1], [2, 3], [4]], map(list, slices))
+        self.assertEquals([2, 2, 1], map(len, slices))
+        self.assertTrue(all(chunk.items is items for chunk in slices))
+        self.assertEquals([], list(iter_slices([], 2)))
+
+    def test_run(self):
+        def slow(item):
+            time.sleep(0.02)
+            return item
+
+        pipeline = Pipeline([lambda x: x + 1, slow, slow, lambda x: x * 2])
+        start = time.time()
+        self.assertEquals([2, 4, 6, 8, 10], pipeline.run(xrange(5)))
+        # the slow stages overlap: 5 items + 1 step, instead of 5 * 2 steps
+        self.assertTrue(time.time() - start < 0.18)
+
+    def test_error(self):
+        discarded = []
+
+        def fail(item):
+            if item == 3:
+                raise ValueError(item)
+            return item
+
+        def slow(item):
+            time.sleep(0.05)
+            return item
+
+        pipeline = Pipeline(
+            [lambda x: x, slow, fail], max_in_flight=1,
+            discard=lambda item, index: discarded.append((item, index))
+        )
+        self.assertRaises(ValueError, pipeline.run, xrange(10))
+        for item, index in discarded:
+            self.assertTrue(item > 3)
+            self.assertIn(index, (1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import Queue
+import sys
+import unittest
+
+from gooddataclient.polling import Poller
+from gooddataclient.exceptions import PollingTimeout, PollingCancelled
+
+from tests import logger
+
+
+logger.set_log_level(debug=('-v' in sys.argv))
+
+
+class TestPoller(unittest.TestCase):
+
+    def test_intervals(self):
+        poller = Poller(interval=1, backoff=2, max_interval=5, jitter=0)
+        intervals = poller.get_intervals()
+        self.assertEquals([1, 2, 4, 5, 5], [intervals.next() for _ in range(5)])
+
+        poller = Poller(interval=1, jitter=0.5)
+        for interval in list(poller.get_intervals().next() for _ in range(20)):
+            self.assertTrue(0.5 <= interval <= 1.5)
+
+    def test_poll(self):
+        checks = []
+
+        def check():
+            checks.append(True)
+            return len(checks) == 3, 'done'
+
+        poller = Poller(interval=0.001)
+        self.assertEquals('done', poller.poll(check))
+        self.assertEquals(3, len(checks))
+
+    def test_poll_all(self):
+        counts = {'fast': 0, 'slow': 0}
+
+        def get_check(key, checks_needed):
+            def check():
+                counts[key] += 1
+                return counts[key] == checks_needed, key.upper()
+            return check
+
+        poller = Poller(interval=0.001, jitter=0)
+        results = list(poller.iter_poll_all([
+            ('slow', get_check('slow', 4)), ('fast', get_check('fast', 2))
+        ]))
+        self.assertEquals([('fast', 'FAST'), ('slow', 'SLOW')], results)
+        self.assertEquals({'fast': 2, 'slow': 4}, counts)
+
+        poller = Poller(interval=0.001, timeout=0.01)
+        checks = [('uri', lambda: (False, None))]
+        self.assertRaises(PollingTimeout, list, poller.iter_poll_all(checks))
+
+    def test_poll_all_more(self):
+        more = Queue.Queue()
+        more.put(('added', lambda: (True, 'ADDED')))
+        poller = Poller(interval=0.001)
+        results = poller.iter_poll_all([('first', lambda: (True, 'FIRST'))], more)
+        self.assertEquals(('first', 'FIRST'), results.next())
+        self.assertEquals(('added', 'ADDED'), results.next())
+        more.put(('last', lambda: (True, 'LAST')))
+        more.put(None)
+        self.assertEquals([('last', 'LAST')], list(results))
+
+    def test_timeout(self):
+        poller = Poller(interval=0.001, timeout=0.01)
+        self.assertRaises(PollingTimeout, poller.poll, lambda: (False, None), 'uri')
+
+    def test_cancel(self):
+        poller = Poller(interval=0.001, cancel=lambda: True)
+        self.assertRaises(PollingCancelled, poller.poll, lambda: (False, None), 'uri')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,17 +1,20 @@
 import sys
 import unittest
 import os
+from cStringIO import StringIO
 
 from gooddataclient.connection import Connection
 from gooddataclient.project import Project
-from gooddataclient.report import Report
-from gooddataclient.exceptions import ReportExportFailed
+from gooddataclient.report import Report, export_reports
+from gooddataclient.exceptions import ReportExportFailed, BatchExportFailed
+from gooddataclient.polling import Poller
 
 from tests.credentials import (
     password, username, test_report_id, report_project_id,
     test_empty_report_id
 )
 from tests import logger
+from tests.fake_server import FakeGoodData
 
 logger.set_log_level(debug=('-v' in sys.argv))
 
@@ -58,5 +61,83 @@ class TestReport(unittest.TestCase):
                 self.fail()
         os.remove(file_path)
 
+
+class FakeServerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeGoodData(task_duration=0.01).start()
+        connection = Connection(
+            'user', 'password', host=self.server.url, webdav_host=self.server.url,
+            poller=Poller(interval=0.002)
+        )
+        self.project = Project(connection).load(id=self.server.add_project('test'))
+
+    def tearDown(self):
+        self.server.stop()
+
+
+class TestReportStream(FakeServerTestCase):
+
+    def get_report(self, content):
+        self.server.report_csv = content
+        report = Report(self.project, 'report')
+        report.export_report()
+        return report
+
+    def test_stream_report(self):
+        content = '"a","b"\r\n"1","\xc3\xa9"\r\n' * 10
+        output = StringIO()
+        self.assertEquals(len(content), self.get_report(content).stream_report(output, chunk_size=7))
+        self.assertEquals(content, output.getvalue())
+        self.assertEquals(content, ''.join(self.get_report(content).iter_report_chunks()))
+
+    def test_iter_rows(self):
+        content = '"a","b"\r\n"1","\xc3\xa9"\r\n"2","multi\nline"\r\n"",""\r\n'
+        rows = [{'a': '1', 'b': '\xc3\xa9'}, {'a': '2', 'b': 'multi\nline'}, {'a': '', 'b': ''}]
+        for chunk_size in (1, 4, 1024):
+            self.assertEquals(rows, list(self.get_report(content).iter_rows(chunk_size=chunk_size)))
+        self.assertEquals(
+            [{'a': 1, 'b': u'\xe9'}, {'a': 2, 'b': u'multi\nline'}, {'a': None, 'b': None}],
+            list(self.get_report(content).iter_rows(typed=True))
+        )
+
+    def test_empty_report(self):
+        self.assertEquals([''], list(self.get_report('').iter_report_chunks()))
+
+
+class TestExportReports(FakeServerTestCase):
+
+    def get_exports(self, count):
+        exports = []
+        for i in range(count):
+            report = Report(self.project, str(i))
+            self.server.reports[
+                Report.REPORT_DEFINITION_URI % {'project': self.project.id, 'report': i}
+            ] = '"id"\r\n"%d"\r\n' % i
+            exports.append((report, StringIO()))
+        return exports
+
+    def test_export_reports(self):
+        exports = self.get_exports(10)
+        self.assertEquals([len('"id"\r\n"0"\r\n')] * 10, export_reports(exports, workers=3))
+        self.assertEquals(
+            ['"id"\r\n"%d"\r\n' % i for i in range(10)],
+            [output.getvalue() for _, output in exports]
+        )
+
+    def test_errors(self):
+        exports = self.get_exports(3)
+        self.server.failing.add(
+            Report.REPORT_DEFINITION_URI % {'project': self.project.id, 'report': 1}
+        )
+        try:
+            export_reports(exports, workers=2)
+        except BatchExportFailed, err:
+            self.assertEquals([1], err.error_info['errors'].keys())
+        else:
+            self.fail('BatchExportFailed not raised')
+        self.assertEquals('"id"\r\n"2"\r\n', exports[2][1].getvalue())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,107 @@
+import os
+import sys
+import threading
+import unittest
+
+from gooddataclient.archiver import create_archive, get_row_encoder
+from gooddataclient.connection import Webdav
+from gooddataclient.project import Project
+from gooddataclient.tracing import NullTracer, RecordingTracer, count_rows
+
+from tests import logger, examples
+from tests.test_metrics import FakeSession
+
+
+logger.set_log_level(debug=('-v' in sys.argv))
+
+
+class TestTracer(unittest.TestCase):
+
+    def test_spans(self):
+        tracer = RecordingTracer()
+        with tracer.span('upload', dataset='a') as upload:
+            with tracer.span('encode') as encode:
+                encode.set(bytes=10)
+            try:
+                with tracer.span('put'):
+                    raise ValueError('failed')
+            except ValueError:
+                pass
+        self.assertEquals(['encode', 'put', 'upload'], [span.name for span in tracer.spans])
+        self.assertIs(upload, encode.parent)
+        self.assertIsNone(upload.parent)
+        self.assertEquals({'bytes': 10}, encode.attributes)
+        self.assertEquals({'dataset': 'a'}, upload.attributes)
+        self.assertIsInstance(tracer.get_spans('put')[0].error, ValueError)
+        self.assertTrue(upload.duration >= encode.duration >= 0)
+        self.assertEquals('upload', encode.as_dict()['parent'])
+
+    def test_activate(self):
+        tracer = RecordingTracer()
+        with tracer.span('upload') as upload:
+            thread = threading.Thread(target=self.run_in_span, args=(tracer, upload))
+            thread.start()
+            thread.join()
+        self.assertIs(upload, tracer.get_spans('put')[0].parent)
+        self.assertIsNone(tracer.get_current_span())
+
+    def run_in_span(self, tracer, parent):
+        with tracer.activate(parent):
+            with tracer.span('put'):
+                pass
+
+    def test_null_tracer(self):
+        with NullTracer().span('upload', dataset='a') as span:
+            span.set(rows=1)
+        self.assertFalse(span.recording)
+        self.assertIsNone(span.duration)
+
+    def test_count_rows(self):
+        tracer = RecordingTracer()
+        with tracer.span('upload') as span:
+            self.assertEquals([1, 2, 3], list(count_rows(iter([1, 2, 3]), span)))
+        self.assertEquals({'rows': 3}, span.attributes)
+
+
+class TestUploadSpans(unittest.TestCase):
+
+    def setUp(self):
+        example, ExampleDataset = examples.examples[0]
+        self.data = ExampleDataset(Project(None)).data()
+        self.sli_manifest = example.sli_manifest
+        self.dates, self.datetimes = example.dates, example.datetimes
+
+    def test_archive_spans(self):
+        tracer = RecordingTracer()
+        archive = create_archive(
+            self.data, self.sli_manifest, self.dates, self.datetimes,
+            row_encoder=get_row_encoder(self.sli_manifest, self.dates, self.datetimes),
+            tracer=tracer
+        )
+        try:
+            self.assertEquals(['encode', 'zip'], [span.name for span in tracer.spans])
+            self.assertEquals(os.path.getsize(archive), tracer.spans[1].attributes['bytes'])
+            self.assertTrue(tracer.spans[0].attributes['bytes'] > 0)
+        finally:
+            os.remove(archive)
+
+    def test_webdav_spans(self):
+        for stream in (False, True):
+            tracer = RecordingTracer()
+            session = FakeSession()
+            webdav = Webdav('', '', session=session, tracer=tracer)
+            dir_name = webdav.upload(
+                self.data, self.sli_manifest, self.dates, self.datetimes, stream=stream
+            )
+            webdav.delete(dir_name)
+            names = [span.name for span in tracer.spans]
+            if stream:
+                self.assertEquals(['mkcol', 'put', 'delete'], names)
+            else:
+                self.assertEquals(['encode', 'zip', 'mkcol', 'put', 'delete'], names)
+            put = tracer.get_spans('put')[0]
+            self.assertEquals(len(session.sent[1]), put.attributes['bytes'])
+
+
+if __name__ == '__main__':
+    unittest.main()
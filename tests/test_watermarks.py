@@ -0,0 +1,54 @@
+import os
+import sys
+import unittest
+from collections import namedtuple
+from datetime import datetime
+from tempfile import mkstemp
+
+from gooddataclient.watermarks import Watermarks, HighWatermark
+
+from tests import logger
+
+
+logger.set_log_level(debug=('-v' in sys.argv))
+
+
+class TestWatermarks(unittest.TestCase):
+
+    def setUp(self):
+        fp, self.path = mkstemp()
+        os.close(fp)
+        self.store = Watermarks(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        os.remove(self.path)
+
+    def test_store(self):
+        self.assertEquals(None, self.store.get('dataset'))
+        self.store.set('dataset', datetime(2013, 1, 2, 3, 4))
+        self.store.set('other', 42)
+        self.assertEquals(datetime(2013, 1, 2, 3, 4), Watermarks(self.path).get('dataset'))
+        self.assertEquals(42, self.store.get('other'))
+        self.store.clear('dataset')
+        self.assertEquals(None, self.store.get('dataset'))
+
+    def test_high_watermark(self):
+        Row = namedtuple('Row', ('id', 'date'))
+        rows = [
+            {'id': 1, 'date': datetime(2013, 1, 2)},
+            {'id': 2, 'date': None},
+            Row(3, datetime(2013, 1, 5)),
+            (4, ''),
+        ]
+        watermark = HighWatermark('date', ('id', 'date'))
+        self.assertEquals(rows, list(watermark.track(rows)))
+        self.assertEquals(datetime(2013, 1, 5), watermark.value)
+
+        watermark = HighWatermark('id', ('id', 'date'), value=10)
+        list(watermark.track(rows))
+        self.assertEquals(10, watermark.value)
+
+
+if __name__ == '__main__':
+    unittest.main()